@@ -0,0 +1,69 @@
+'''
+Closed form solution of the Benders subproblem of the Uncapacitated Facility Location (UFL) Problem
+
+For fixed x the subproblem separates by customer: every customer fills the capacities bigM*x_j
+of the facilities in decreasing order of profit until its demand of one unit is met. The
+profit of the last (marginal) facility used is the optimal mu_i and nu_{ij} = max(p_{ij} - mu_i, 0).
+If \sum_j bigM x_j < 1 no customer can be served and a Farkas ray (mu_i = -1, nu_{ij} = 1)
+is returned instead, i.e. the cut \sum_j bigM x_j >= 1.
+
+Only NumPy is needed, so this backend can also be used where Gurobi is not available.
+'''
+
+
+import numpy as np
+
+
+# Same status codes as GRB.OPTIMAL and GRB.INFEASIBLE
+OPTIMAL = 2
+INFEASIBLE = 3
+
+
+class AnalyticSubProblem:
+    def __init__(self, C, F, p, f, bigM, tol=1e-9):
+        self.C = C
+        self.F = F
+        self.p = np.asarray(p, dtype=float)
+        self.f = np.asarray(f, dtype=float)
+        self.bigM = bigM
+        self.tol = tol
+        # p is fixed, so the facilities are sorted once for every customer
+        self.order = np.argsort(-self.p, axis=1, kind='stable')
+        self.pSorted = np.take_along_axis(self.p, self.order, axis=1)
+        self.rows = np.arange(C)
+        self.nuKeys = [(i, j) for i in range(C) for j in range(F)]
+
+    def solveArrays(self, x):
+        '''
+        Returns obj, mu (C), nu (C x F), y (C x F) and status as NumPy arrays
+        '''
+        x = np.asarray(x, dtype=float)
+        cap = self.bigM*x
+        fx = float(self.f @ x)
+
+        if cap.sum() < 1 - self.tol:
+            mu = np.zeros(self.C)
+            nu = np.zeros((self.C, self.F))
+            mu[0] = -1
+            nu[0, :] = 1
+            return -float("inf"), mu, nu, np.zeros((0, self.F)), INFEASIBLE
+
+        capSorted = cap[self.order]
+        cum = np.cumsum(capSorted, axis=1)
+        ySorted = np.clip(1 - (cum - capSorted), 0, capSorted)
+        marginal = np.argmax(cum >= 1 - self.tol, axis=1)
+        mu = self.pSorted[self.rows, marginal]
+        nu = np.maximum(self.p - mu[:, None], 0)
+        y = np.empty_like(ySorted)
+        np.put_along_axis(y, self.order, ySorted, axis=1)
+        obj = float((self.pSorted*ySorted).sum()) - fx
+        return obj, mu, nu, y, OPTIMAL
+
+    def solve(self, x):
+        '''
+        Same (obj, mu, nu, y, status) tuple as UFLSubProblem.solve
+        '''
+        obj, mu, nu, y, status = self.solveArrays(x)
+        mu = dict(enumerate(mu.tolist()))
+        nu = dict(zip(self.nuKeys, nu.ravel().tolist()))
+        return obj, mu, nu, y.ravel().tolist(), status
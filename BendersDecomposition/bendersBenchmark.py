@@ -0,0 +1,101 @@
+'''
+Benchmark of the Benders variants for the Uncapacitated Facility Location (UFL) Problem
+
+Every strategy of bendersEngine.py and the monolithic Gurobi model are run on the instances
+generateFacilityLocationData(C, F, seed) for all the sizes and seeds below. One record per
+(instance, method) is written to a CSV and a JSON file with the wall time, iterations, cut
+counts, master vs subproblem time and final gap, so runs of different versions can be compared.
+
+    records = runBenchmark(sizes, seeds, strategies, backend, 'benchmark')
+'''
+
+
+import csv
+import json
+import time
+import numpy as np
+from gurobipy import *
+from bendersEngine import generateFacilityLocationData, solveModelGurobi, BendersUFL, strategies
+
+
+fields = ['C', 'F', 'seed', 'method', 'backend', 'status', 'obj', 'gurobiObj', 'sameObj', 'time',
+          'iterations', 'masterSolves', 'subProblems', 'cuts', 'cutsRemoved', 'masterTime',
+          'subProblemTime', 'gap']
+
+
+def runGurobi(C, F, p, f, bigM):
+    record = {'method': 'gurobi', 'backend': '', 'status': 'ok'}
+    start = time.time()
+    try:
+        record['obj'] = solveModelGurobi(C, F, p, f, bigM)[0]
+    except GurobiError as e:
+        record['status'] = str(e)
+    record['time'] = time.time() - start
+    return record
+
+
+def runStrategy(C, F, p, f, bigM, name, options, backend, eps, maxit):
+    record = {'method': name, 'backend': backend, 'status': 'ok'}
+    start = time.time()
+    solver = None
+    try:
+        solver = BendersUFL(C, F, p, f, bigM, backend=backend, **options)
+        xb, yb, obb = solver.solve(eps, np.ones(F), maxit)
+        record['obj'] = obb
+        record.update(solver.stats)
+    except Exception as e:
+        # A failing strategy is recorded, the rest of the sweep still runs
+        record['status'] = str(e)
+    finally:
+        if solver is not None:
+            solver.close()
+    # Wall time of the strategy including the setup of the subproblems
+    record['time'] = time.time() - start
+    return record
+
+
+def runBenchmark(sizes, seeds, methods, backend='analytic', fileName=None, bigM=1, eps=0, maxit=1000, verbose=1):
+    '''
+    Returns the list of records, also written to fileName.csv and fileName.json if fileName is given
+    '''
+    records = []
+    for (C, F) in sizes:
+        for seed in seeds:
+            C, F, p, f = generateFacilityLocationData(C, F, seed)
+            instanceRecords = [runGurobi(C, F, p, f, bigM)]
+            for name in methods:
+                instanceRecords.append(runStrategy(C, F, p, f, bigM, name, strategies[name], backend, eps, maxit))
+
+            gurobiObj = instanceRecords[0].get('obj')
+            for record in instanceRecords:
+                record.update({'C': C, 'F': F, 'seed': seed, 'gurobiObj': gurobiObj})
+                if gurobiObj is not None and 'obj' in record:
+                    record['sameObj'] = bool(round(record['obj']) == round(gurobiObj))
+                if verbose == 1:
+                    print("C = {:5d} F = {:4d} seed = {:6d} {:35s} obj = {} took... {:8.2f} seconds".format(
+                        C, F, seed, record['method'], record.get('obj', record['status']), record['time']))
+            records += instanceRecords
+
+    if fileName is not None:
+        writeRecords(records, fileName)
+    return records
+
+
+def writeRecords(records, fileName):
+    with open(fileName + '.csv', 'w', newline='') as out:
+        writer = csv.DictWriter(out, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(records)
+    with open(fileName + '.json', 'w') as out:
+        json.dump(records, out, indent=1)
+
+
+if __name__ == '__main__':
+    # Step 1: Instances and methods
+    sizes = [(50, 10), (100, 10), (100, 20), (200, 20)]
+    seeds = [15645, 3501, 159]
+    methods = list(strategies)
+    # Step 2: Run and save the results
+    start = time.time()
+    runBenchmark(sizes, seeds, methods, 'analytic', 'bendersBenchmark')
+    print("Benchmark took...", round(time.time() - start, 2), "seconds")
@@ -0,0 +1,162 @@
+'''
+Cut pool for the Benders master problem of the UFL problem
+
+Every cut is stored in the form eta_e <= const + \sum_{j \in F} a_j x_j (e = -1 for a
+feasibility cut, i.e. 0 <= const + a x). Before a cut is added to the master the pool
+
+    - drops it if the same normalized cut is already in the master (hash of the rounded row),
+    - drops it if an active cut of the same eta dominates it on 0 <= x <= 1, and
+    - removes the active cuts of the same eta that the new cut dominates.
+
+After every master solve the slack of the active cuts is computed in the master solution.
+Binding cuts get age 0, the others get one year older, and cuts older than maxAge are
+removed from the master, so the size of the master LP stays bounded. The caller only asks
+for the removal when the master bound improved, otherwise removed cuts can be generated
+again and again.
+
+    pool = CutPool(F, maxAge=50)
+    pool.addCuts(m, m._eta, m._x, etaIdx, const, coeff)
+    pool.update(m)
+'''
+
+
+import numpy as np
+from bendersCuts import addCutRows
+
+
+class CutPool:
+    def __init__(self, F, maxAge=50, tol=1e-6, digits=9):
+        self.F = F
+        self.maxAge = maxAge
+        self.tol = tol
+        self.digits = digits
+        self.rows = {}   # eta index -> positions of the active cuts
+        self.keys = {}   # hash key -> position
+        self.eta = np.zeros(0, dtype=int)
+        self.const = np.zeros(0)
+        self.coeff = np.zeros((0, F))
+        self.age = np.zeros(0, dtype=int)
+        self.active = np.zeros(0, dtype=bool)
+        self.key = []
+        self.constrs = []
+        self.stats = {'added': 0, 'duplicates': 0, 'dominated': 0, 'removed': 0}
+
+    def __len__(self):
+        return int(self.active.sum())
+
+    def hashKey(self, e, const, coeff):
+        # Optimality cuts have coefficient 1 for eta, feasibility cuts are scaled to unit norm
+        if e < 0:
+            scale = max(np.abs(coeff).max(initial=0), abs(const))
+            if scale > 0:
+                const, coeff = const / scale, coeff / scale
+        return (e, round(float(const), self.digits), np.round(coeff, self.digits).tobytes())
+
+    def dominance(self, positions, const, coeff):
+        '''
+        max_{0 <= x <= 1} of (cut k) - (new cut) for every active cut k in positions,
+        k dominates the new cut if it is <= 0 and the new cut dominates k if the reverse is >= 0
+        '''
+        diff = self.coeff[positions] - coeff
+        dominates = self.const[positions] - const + np.maximum(diff, 0).sum(axis=1)
+        dominated = self.const[positions] - const + np.minimum(diff, 0).sum(axis=1)
+        return dominates, dominated
+
+    def deactivate(self, m, positions):
+        for k in positions:
+            m.remove(self.constrs[k])
+            self.constrs[k] = None
+            self.active[k] = False
+            self.rows[self.eta[k]].remove(k)
+            del self.keys[self.key[k]]
+
+    def filterCuts(self, m, etaIdx, const, coeff):
+        '''
+        Returns the rows of the new cuts that are neither duplicated nor dominated
+        '''
+        keep = []
+        batch = {}
+        for r in range(len(etaIdx)):
+            e = int(etaIdx[r])
+            key = self.hashKey(e, const[r], coeff[r])
+            if key in self.keys or key in batch:
+                self.stats['duplicates'] += 1
+                continue
+            positions = np.array(self.rows.get(e, []), dtype=int)
+            if len(positions) > 0:
+                dominates, dominated = self.dominance(positions, const[r], coeff[r])
+                if (dominates <= self.tol).any():
+                    self.stats['dominated'] += 1
+                    continue
+                removed = positions[dominated >= -self.tol]
+                self.deactivate(m, removed)
+                self.stats['dominated'] += len(removed)
+            # Dominance inside the same batch is not checked, only exact duplicates
+            batch[key] = r
+            keep.append(r)
+        return keep, list(batch)
+
+    def addCuts(self, m, eta, x, etaIdx, const, coeff):
+        '''
+        Adds the rows of eta_{etaIdx} <= const + coeff x that are new to the master and returns their number
+        '''
+        etaIdx = np.asarray(etaIdx, dtype=int)
+        const = np.asarray(const, dtype=float)
+        coeff = np.asarray(coeff, dtype=float).reshape(len(etaIdx), self.F)
+        keep, keys = self.filterCuts(m, etaIdx, const, coeff)
+        if len(keep) == 0:
+            return 0
+
+        constrs = addCutRows(m, eta, x, etaIdx[keep], const[keep], coeff[keep]).tolist()
+        start = len(self.eta)
+        self.eta = np.concatenate([self.eta, etaIdx[keep]])
+        self.const = np.concatenate([self.const, const[keep]])
+        self.coeff = np.vstack([self.coeff, coeff[keep]])
+        self.age = np.concatenate([self.age, np.zeros(len(keep), dtype=int)])
+        self.active = np.concatenate([self.active, np.ones(len(keep), dtype=bool)])
+        self.key += keys
+        self.constrs += constrs
+        for k, e in enumerate(etaIdx[keep].tolist()):
+            self.rows.setdefault(e, []).append(start + k)
+            self.keys[keys[k]] = start + k
+        self.stats['added'] += len(keep)
+        return len(keep)
+
+    def update(self, m, purge=True):
+        '''
+        Ages the cuts with the master solution and, if purge, removes the ones older than maxAge.
+        Returns the number of cuts removed.
+        '''
+        active = np.nonzero(self.active)[0]
+        if len(active) == 0:
+            return 0
+        etaVal = np.append(m.getAttr('X', m._eta), 0)
+        xVal = np.array(m.getAttr('X', m._x))
+        e = self.eta[active]
+        slack = self.const[active] + self.coeff[active] @ xVal - etaVal[e]
+        binding = slack <= self.tol*np.maximum(1, np.abs(self.const[active]))
+        self.age[active] = np.where(binding, 0, self.age[active] + 1)
+        if not purge:
+            return 0
+        old = active[self.age[active] > self.maxAge]
+        self.deactivate(m, old)
+        self.stats['removed'] += len(old)
+        if len(self.eta) > 2*len(self) + 1000:
+            self.compact()
+        return len(old)
+
+    def compact(self):
+        '''
+        Drops the removed cuts from the arrays
+        '''
+        active = np.nonzero(self.active)[0]
+        position = {int(k): n for n, k in enumerate(active)}
+        self.eta = self.eta[active]
+        self.const = self.const[active]
+        self.coeff = self.coeff[active]
+        self.age = self.age[active]
+        self.active = self.active[active]
+        self.key = [self.key[k] for k in active]
+        self.constrs = [self.constrs[k] for k in active]
+        self.rows = {e: [position[k] for k in positions] for e, positions in self.rows.items()}
+        self.keys = {key: position[k] for key, k in self.keys.items()}
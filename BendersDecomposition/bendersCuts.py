@@ -0,0 +1,93 @@
+'''
+Construction of Benders cuts for the master problem of the UFL problem
+
+mu and nu are the arrays returned by the subproblems (C and C x F entries) and eta, x are
+lists with the master variables (cached on the master as m._eta and m._x, never looked up
+by name). The coefficients are aggregated per facility with NumPy first, so every cut is a
+single LinExpr built from a coefficient and a variable list instead of C*F Python terms.
+'''
+
+
+import numpy as np
+import scipy.sparse as sparse
+from gurobipy import *
+
+
+def linearExpression(constant, coeff, x):
+    '''
+    constant + \sum_{j} coeff_j x_j, only the nonzero coefficients are kept
+    '''
+    cols = np.nonzero(coeff)[0]
+    expr = LinExpr(coeff[cols].tolist(), [x[j] for j in cols])
+    expr.addConstant(float(constant))
+    return expr
+
+
+def aggregatedCutExpression(x, mu, nu, bigM):
+    '''
+    \sum_{i \in C} mu_i + \sum_{j \in F} (\sum_{i \in C} bigM nu_{ij}) x_j
+    '''
+    nu = np.asarray(nu, dtype=float)
+    return linearExpression(np.sum(mu), bigM*nu.sum(axis=0), x)
+
+
+def disaggregatedCutExpressions(x, mu, nu, bigM, rows):
+    '''
+    mu_i + \sum_{j \in F} bigM nu_{ij} x_j for every customer i in rows
+    '''
+    nu = np.asarray(nu, dtype=float)
+    return [linearExpression(mu[i], bigM*nu[i], x) for i in rows]
+
+
+def addAggregatedOptimalityCut(m, eta, x, mu, nu, bigM):
+    '''
+    Adds eta <= \sum_{i \in C} mu_i + \sum_{j \in F} \sum_{i \in C} bigM nu_{ij} x_j
+    '''
+    return m.addConstr(eta <= aggregatedCutExpression(x, mu, nu, bigM))
+
+
+def addAggregatedFeasibilityCut(m, x, mu, nu, bigM):
+    '''
+    Adds \sum_{i \in C} mu_i + \sum_{j \in F} \sum_{i \in C} bigM nu_{ij} x_j >= 0
+    '''
+    return m.addConstr(aggregatedCutExpression(x, mu, nu, bigM) >= 0)
+
+
+def addDisaggregatedOptimalityCuts(m, eta, x, mu, nu, bigM):
+    '''
+    Adds eta_i <= mu_i + \sum_{j \in F} bigM nu_{ij} x_j for all customers in one call
+    '''
+    nu = np.asarray(nu, dtype=float)
+    A = sparse.hstack([sparse.identity(len(eta), format='csr'), sparse.csr_matrix(-bigM*nu)], format='csr')
+    return m.addMConstr(A, eta + x, GRB.LESS_EQUAL, np.asarray(mu, dtype=float))
+
+
+def feasibilityRows(mu, nu):
+    '''
+    Customers with a nonzero Farkas ray
+    '''
+    return np.nonzero((np.asarray(mu) != 0) | (np.asarray(nu) != 0).any(axis=1))[0]
+
+
+def addDisaggregatedFeasibilityCuts(m, x, mu, nu, bigM):
+    '''
+    Adds mu_i + \sum_{j \in F} bigM nu_{ij} x_j >= 0 for all customers with a nonzero ray in one call
+    '''
+    mu = np.asarray(mu, dtype=float)
+    nu = np.asarray(nu, dtype=float)
+    rows = feasibilityRows(mu, nu)
+    if len(rows) == 0:
+        return None
+    return m.addMConstr(sparse.csr_matrix(bigM*nu[rows]), x, GRB.GREATER_EQUAL, -mu[rows])
+
+
+def addCutRows(m, eta, x, etaIdx, constant, coeff):
+    '''
+    Adds eta_{etaIdx_k} <= constant_k + \sum_{j \in F} coeff_{kj} x_j for every row k in one call.
+    Rows with etaIdx_k = -1 are feasibility cuts 0 <= constant_k + \sum_{j \in F} coeff_{kj} x_j.
+    '''
+    etaIdx = np.asarray(etaIdx)
+    rows = np.nonzero(etaIdx >= 0)[0]
+    E = sparse.csr_matrix((np.ones(len(rows)), (rows, etaIdx[rows])), shape=(len(etaIdx), len(eta)))
+    A = sparse.hstack([E, sparse.csr_matrix(-np.asarray(coeff, dtype=float))], format='csr')
+    return m.addMConstr(A, eta + x, GRB.LESS_EQUAL, np.asarray(constant, dtype=float))
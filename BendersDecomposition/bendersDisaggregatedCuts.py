@@ -12,24 +12,8 @@ s.t.          \sum_{j \in F} y_{ij} = 1, \forall i \in C
 
 
 import numpy as np
-from gurobipy import *
 import time
-
-
-
-
-
-
-def generateFacilityLocationData(C, F):
-    # Unbounded ray instance seed 159
-    np.random.seed(3501)
-    p =  np.random.randint(1000, size=(C, F))
-    f = np.random.randint(1000, size=(F))
-    for j in range(F):
-        for i in range(C):
-            f[j] += round(0.05*p[i,j])
-
-    return C, F, p, f
+from bendersEngine import generateFacilityLocationData, solveModelGurobi as gurobiModel, checkGurobiBendersSimilarity, BendersUFL
 
 
 # Step 1: Initialize variables
@@ -41,242 +25,35 @@ F = 10
 # Step 2: Start clock
 ts = time.time()
 # Step 3: Generate instance
-C, F, p, f = generateFacilityLocationData(C,F)
+C, F, p, f = generateFacilityLocationData(C, F, 3501)
 
 ############################################################################################################################
 ##############################################################################################################################
 
-    
-
-
-def solveModelGurobi():
-    m2 = Model()
-    x = {j: m2.addVar(lb=0, vtype=GRB.BINARY) for j in range(F)}
-    y = {(i, j): m2.addVar(lb=0, vtype=GRB.BINARY) for i in range(C) for j in range(F)}
-    for i in range(C):
-        m2.addConstr(sum([y[i, j] for j in range(F)]) == 1)
-    for j in range(F):
-        for i in range(C):
-            m2.addConstr(y[i, j] <= bigM*x[j])
-    
-    obj = sum([p[i, j] * y[i, j]  for j in range(F) for i in range(C)]) -sum([f[j] * x[j] for j in range(F)])
 
-    m2.setObjective(obj, sense=GRB.MAXIMIZE)
-    m2.update()
-    m2.Params.OutputFlag = 0
-    m2.setParam('OutputFlag', False)
-    m2.optimize()
-    xVal= [x[j].x for j in range(F)]
-    yVal =[y[i, j].x for i in range(C) for j in range(F)]
-    return m2.objVal, xVal, yVal
 
 
-def subProblem(x):
-    m1 = Model()
-    y = {(i, j):  m1.addVar(lb=0, vtype=GRB.CONTINUOUS) for i in range(C) for j in range(F)}
-    constrMu = {}
-    constrNu = {}
-    for i in range(C):
-        constrMu[i] = m1.addConstr(sum([y[i, j] for j in range(F)]) == 1)
-    for j in range(F):
-        for i in range(C):
-            constrNu[i, j] = m1.addConstr(y[i, j] <= bigM*x[j])
-
-    obj = sum([p[i, j] * y[i, j]  for j in range(F) for i in range(C)]) -sum([f[j] * x[j] for j in range(F)])
-
-    m1.setObjective(obj, sense=GRB.MAXIMIZE)
-
-    m1.update()
-    m1.Params.OutputFlag = 0
-    m1.Params.InfUnbdInfo = 1
-    m1.Params.DualReductions = 0
-
-    m1.optimize()
-
-    if m1.status == GRB.OPTIMAL:
-        mu = {}
-        nu = {}
-        for i in range(C):
-            mu[i] = constrMu[i].pi
-        for j in range(F):
-            for i in range(C):
-                nu[i, j] = constrNu[i, j].pi
-        return m1.objVal, mu, nu, [y[i, j].x for i in range(C) for j in range(F)], m1.status
-    else:
-        mu = {}
-        nu = {}
-        for i in range(C):
-            mu[i] = constrMu[i].FarkasDual
-        for j in range(F):
-            for i in range(C):
-                nu[i, j] = constrNu[i, j].FarkasDual
-        return -float("inf"), mu, nu, [], m1.status
-    
-    
-def solveMasterAggCuts(m,  optCuts_mu, optCuts_nu, fesCuts_mu, fesCuts_nu):
-
-    '''
-    Adding optimality cut
-    '''
-    
-    if len(optCuts_nu) != 0:            
-        for i in range(C):
-            tot = optCuts_mu[i]
-            for j in range(F): 
-                tot += optCuts_nu[i, j]*m.getVarByName(str(j))*bigM    
-            m.addConstr(m.getVarByName('eta_' + str(i)) <= tot)
-    '''
-    Adding feasibility cut
-    '''
-    if len(fesCuts_mu) != 0:        
-        for i in range(C):
-            tot = fesCuts_mu[i]
-            for j in range(F): 
-                tot += fesCuts_nu[i, j]*m.getVarByName(str(j))*bigM    
-            m.addConstr (tot >= 0)
-            
-            
-    
-
-    
-    m.optimize()
-    if m.status == GRB.OPTIMAL:
-        return m.objVal, [m.getVarByName(str(k)).x for k in range(F)], m.getVarByName('eta'), m
-    else:
-        print("Original model is infeasible", m.status)
-
-            
-            
-
-
-
-
-def setupMasterProblemModel():
-    m = Model()    
-    eta = {i: m.addVar(vtype=GRB.CONTINUOUS, ub = 1e5, name ='eta_' + str(i)) for i in range(C)}  
-    x = {j: m.addVar(lb=0, vtype=GRB.BINARY, name = str(j)) for j in range(F)}
-    
-    m.setObjective(sum([eta[i] for i in range(C)]) -sum([f[j] * x[j] for j in range(F)]), sense=GRB.MAXIMIZE)
-    m.update()
-    m.Params.OutputFlag = 0
-    m.Params.lazyConstraints = 1
-    return m
-
-
-def callBackFunction(model, where):
-    if where == GRB.Callback.MIPSOL: 
-        xHat = [model.cbGetSolution(model.getVarByName(str(k))) for k in range(F)]
-        UB = model.cbGet(GRB.Callback.MIPSOL_OBJ)
-        LB, mu, nu, y, status = subProblem(xHat)
-        #print(LB, UB, xHat)
-        if status == 3:            
-            for i in range(C):
-                tot = mu[i]
-                for j in range(F): 
-                    tot += nu[i, j]*model.getVarByName(str(j))*bigM    
-                model.cbLazy(tot >= 0)
-            
-        
-            
-            
-            
-        if status == 2:            
-            if round(LB) != round(UB):   
-                for i in range(C):
-                    tot = mu[i]
-                    for j in range(F): 
-                        tot += nu[i, j]*model.getVarByName(str(j))*bigM    
-                    model.cbLazy(model.getVarByName('eta_' + str(i)) <= tot)
-
-            else:
-                pass
-                
-                
-
-                #model.terminate()      
-            
-       
-        
-
+def solveModelGurobi():
+    return gurobiModel(C, F, p, f, bigM)
 
 
 def bendersDisaggCuts(eps, x_initial, maxit, verbose=0):
-    UB = float("inf")
-    LB = -float("inf")
-    optCuts_mu = []
-    optCuts_nu = []
-    fesCuts_mu = []
-    fesCuts_nu = []
-    tol = float("inf")
-    it = 0
-    x = x_initial    
-    m = setupMasterProblemModel()
-    while eps < tol  and it < maxit :
-        ob, mu, nu, y, status = subProblem(x)
-        LB = max(LB, ob)
-        if status == 2:
-            obj, x, eta, m = solveMasterAggCuts(m, mu, nu, [], [])
-        else:
-            obj, x, eta, m = solveMasterAggCuts(m,  [], [], mu, nu)        
-        #UB = min(UB, obj)
-        UB = obj
-        tol = UB - LB
-        it += 1
-
-        if verbose == 1:            
-            print('---------------------- iteration '  + str(it) +' -------------------' )
-            print ('LB = ', LB, ', UB = ', UB, ', tol = ', tol)
-            if len([k for k in range(F) if round(x[k]) != 0]) != 0:
-                print('Opened Facilities: \t ', [k for k in range(F) if round(x[k]) != 0])
-            else:
-                print('No open facilities')
-            
-            '''
-            print('Assignment....')
-            for i in range(C):
-                print('Customer \t | \t Facility')
-                print(str(i)+ '\t | \t ' + str([k for k in for j in range(F) for i in range(C) if y[0] == i and y[k] == 1][0]))
-            print(LB, UB, tol, x, it)
-            '''
-        else:
-            continue
-    return x, y, LB
-
-
-
+    solver = BendersUFL(C, F, p, f, bigM, cuts='disaggregated', backend=subProblemBackend, nWorkers=nWorkers)
+    xb, yb, obb = solver.solve(eps, x_initial, maxit, verbose)
+    solver.close()
+    return xb, yb, obb
 
 
 def runCallBackBendersDisagg():
-    m = setupMasterProblemModel()
-    m.optimize(callBackFunction)
-    x = [m.getVarByName(str(j)).x for j in range(F)]
-    ob, mu, nu, y, status = subProblem(x)
-    if round(ob) == round(m.ObjVal):
-        return x, y, m.ObjVal
-    else:
-        print('Callback procedure failed')
-        print ('LB = ', ob, ', UB = ', m.ObjVal)
-        return x, y, m.ObjVal
-
-def checkGurobiBendersSimilarity(xb, yb, xg, yg):
-
-    ind = 0
-    for j in range(F):
-        if round(xb[j]) != round(xg[j]):
-            ind += 1
-    k = 0
-    for j in range(F):
-        for i in range(C):
-            if yb[k] != yg[k]:
-                ind += 1
-            k += 1
-    if ind == 0:
-        print('Solution obtained from both methods are same')
-    else:
-        print('Solution obtained from both methods are different!!')
+    solver = BendersUFL(C, F, p, f, bigM, cuts='disaggregated', mode='callback', backend=subProblemBackend, nWorkers=nWorkers)
+    xb, yb, obb = solver.solve()
+    solver.close()
+    return xb, yb, obb
 
 
 bigM = 1000000000
+subProblemBackend = 'gurobi' # 'gurobi' or 'analytic'
+nWorkers = 1 # customer chunks are solved in a process pool if > 1
 x_initial = np.ones(F)
 x_initial[1] = 1
 x_initial[2] = 0
@@ -292,6 +69,3 @@ start = time.time()
 obg, xg, yg = solveModelGurobi()
 print("Gurobi took...", round(time.time() - start, 2), "seconds")
 checkGurobiBendersSimilarity(xb, yb, xg, yg)
-
-
-
@@ -0,0 +1,442 @@
+'''
+Benders decomposition engine for the Uncapacitated Facility Location (UFL) Problem
+
+Problem:
+
+
+MAXIMIZE      \sum_{i \in C} \sum_{j \in F} p_{ij} y_{ij} - \sum_{j \in F} f_j x_j
+s.t.          \sum_{j \in F} y_{ij} = 1, \forall i \in C
+              0 <= y_{ij} <= x_j, \forall i \in C, \forall j in F
+              x binary, y binary
+
+The Benders scripts of this folder only differ in the way cuts are generated and added to
+the master problem. BendersUFL implements all of them as strategies of one solver, so they
+can be compared on the same instance in one process:
+
+    cuts                'aggregated' (one eta) or 'disaggregated' (one eta_i per customer)
+    pareto              None, 'magnanti-wong' or 'high-density'
+    multipleSolutions   cuts for all the solutions in the solution pool of the master (iterative mode only)
+    localBranching      radius of the local branching constraint around the incumbent (0 = off,
+                        iterative mode only)
+    mode                'iterative' (master re-solved after every round of cuts) or 'callback' (lazy cuts)
+    backend, nWorkers   subproblem solver, see bendersSubproblem.py and bendersParallel.py
+    cutPool, maxCutAge  drop duplicated/dominated cuts and remove cuts not binding for maxCutAge
+                        master solves (iterative mode only), see bendersCutPool.py
+    trace               sink for the per-iteration phase times and counters, see bendersTrace.py
+
+    C, F, p, f = generateFacilityLocationData(C, F, seed)
+    solver = BendersUFL(C, F, p, f, bigM, cuts='disaggregated', mode='callback')
+    x, y, obj = solver.solve(eps, x_initial, maxit, verbose)
+'''
+
+
+import time
+import numpy as np
+from gurobipy import *
+from bendersAnalytic import OPTIMAL
+from bendersSubproblem import UFLParetoSubProblem
+from bendersParallel import CustomerSubProblems
+from bendersCutPool import CutPool
+from bendersTrace import phases
+from bendersCuts import aggregatedCutExpression, disaggregatedCutExpressions, feasibilityRows
+from bendersCuts import addAggregatedOptimalityCut, addAggregatedFeasibilityCut
+from bendersCuts import addDisaggregatedOptimalityCuts, addDisaggregatedFeasibilityCuts
+
+
+def generateFacilityLocationData(C, F, seed=15645):
+    # Unbounded ray instance seed 159
+    np.random.seed(seed)
+    p =  np.random.randint(1000, size=(C, F))
+    f = np.random.randint(1000, size=(F))
+    f += np.round(0.05*p).sum(axis=0).astype(f.dtype)
+
+    return C, F, p, f
+
+
+def solveModelGurobi(C, F, p, f, bigM=1):
+    m2 = Model()
+    x = m2.addVars(F, lb=0, vtype=GRB.BINARY)
+    y = m2.addVars(C, F, lb=0, vtype=GRB.BINARY)
+    m2.addConstrs((y.sum(i, '*') == 1 for i in range(C)))
+    m2.addConstrs((y[i, j] <= bigM*x[j] for i in range(C) for j in range(F)))
+    obj = quicksum(p[i, j]*y[i, j] for i in range(C) for j in range(F)) - quicksum(f[j]*x[j] for j in range(F))
+    m2.setObjective(obj, sense=GRB.MAXIMIZE)
+    m2.Params.OutputFlag = 0
+    m2.optimize()
+    xVal = [x[j].x for j in range(F)]
+    yVal = [y[i, j].x for i in range(C) for j in range(F)]
+    return m2.objVal, xVal, yVal
+
+
+def checkGurobiBendersSimilarity(xb, yb, xg, yg):
+    ind = np.count_nonzero(np.round(xb) != np.round(xg)) + np.count_nonzero(np.round(yb) != np.round(yg))
+    if ind == 0:
+        print('Solution obtained from both methods are same')
+    else:
+        print('Solution obtained from both methods are different!!')
+
+
+class AggregatedCuts:
+    '''
+    eta <= \sum_{i \in C} mu_i + \sum_{j \in F} \sum_{i \in C} bigM nu_{ij} x_j
+    '''
+    def __init__(self, C, F, p, bigM):
+        self.bigM = bigM
+        self.etaUB = float(np.max(p, axis=1).sum())
+
+    def addVariables(self, m):
+        return [m.addVar(vtype=GRB.CONTINUOUS, ub=self.etaUB, name='eta')]
+
+    def cutRows(self, mu, nu, status):
+        '''
+        The cut as eta_e <= const + coeff x rows (e = -1 for a feasibility cut)
+        '''
+        e = 0 if status == OPTIMAL else -1
+        return np.array([e]), np.array([np.sum(mu)]), self.bigM*np.asarray(nu).sum(axis=0)[None, :]
+
+    def addOptimalityCuts(self, m, eta, x, mu, nu):
+        addAggregatedOptimalityCut(m, eta[0], x, mu, nu, self.bigM)
+        return 1
+
+    def addFeasibilityCuts(self, m, x, mu, nu):
+        addAggregatedFeasibilityCut(m, x, mu, nu, self.bigM)
+        return 1
+
+    def addLazyCuts(self, model, eta, x, etaHat, xHat, mu, nu, status, tol):
+        if status == OPTIMAL:
+            rhs = mu.sum() + self.bigM*(nu.sum(axis=0) @ xHat)
+            if etaHat[0] <= rhs + tol*max(1, abs(rhs)):
+                return 0
+            model.cbLazy(eta[0] <= aggregatedCutExpression(x, mu, nu, self.bigM))
+        else:
+            model.cbLazy(aggregatedCutExpression(x, mu, nu, self.bigM) >= 0)
+        return 1
+
+
+class DisaggregatedCuts:
+    '''
+    eta_i <= mu_i + \sum_{j \in F} bigM nu_{ij} x_j, \forall i \in C
+    '''
+    def __init__(self, C, F, p, bigM):
+        self.bigM = bigM
+        self.etaUB = np.max(p, axis=1).astype(float)
+
+    def addVariables(self, m):
+        return [m.addVar(vtype=GRB.CONTINUOUS, ub=self.etaUB[i], name='eta_' + str(i)) for i in range(len(self.etaUB))]
+
+    def cutRows(self, mu, nu, status):
+        if status == OPTIMAL:
+            rows = np.arange(len(mu))
+            return rows, np.asarray(mu), self.bigM*np.asarray(nu)
+        rows = feasibilityRows(mu, nu)
+        return np.full(len(rows), -1), np.asarray(mu)[rows], self.bigM*np.asarray(nu)[rows]
+
+    def addOptimalityCuts(self, m, eta, x, mu, nu):
+        addDisaggregatedOptimalityCuts(m, eta, x, mu, nu, self.bigM)
+        return len(eta)
+
+    def addFeasibilityCuts(self, m, x, mu, nu):
+        constrs = addDisaggregatedFeasibilityCuts(m, x, mu, nu, self.bigM)
+        return 0 if constrs is None else constrs.size
+
+    def addLazyCuts(self, model, eta, x, etaHat, xHat, mu, nu, status, tol):
+        if status == OPTIMAL:
+            rhs = mu + self.bigM*(nu @ xHat)
+            rows = np.nonzero(etaHat > rhs + tol*np.maximum(1, np.abs(rhs)))[0]
+            for i, expr in zip(rows, disaggregatedCutExpressions(x, mu, nu, self.bigM, rows)):
+                model.cbLazy(eta[i] <= expr)
+        else:
+            rows = feasibilityRows(mu, nu)
+            for expr in disaggregatedCutExpressions(x, mu, nu, self.bigM, rows):
+                model.cbLazy(expr >= 0)
+        return len(rows)
+
+
+class BendersUFL:
+    def __init__(self, C, F, p, f, bigM=1, cuts='aggregated', pareto=None, multipleSolutions=False,
+                 localBranching=0, mode='iterative', backend='gurobi', nWorkers=1, corePoint=None, tol=1e-6,
+                 cutPool=False, maxCutAge=50, trace=None):
+        self.C = C
+        self.F = F
+        self.p = p
+        self.f = np.asarray(f, dtype=float)
+        self.bigM = bigM
+        if cuts == 'aggregated':
+            self.cuts = AggregatedCuts(C, F, p, bigM)
+        elif cuts == 'disaggregated':
+            self.cuts = DisaggregatedCuts(C, F, p, bigM)
+        else:
+            raise ValueError("Cut strategy ({:s}) is not recognized".format(cuts))
+        if pareto not in (None, 'magnanti-wong', 'high-density'):
+            raise ValueError("Pareto strategy ({:s}) is not recognized".format(pareto))
+        if mode not in ('iterative', 'callback'):
+            raise ValueError("Mode ({:s}) is not recognized".format(mode))
+        if cutPool and mode != 'iterative':
+            raise ValueError("The cut pool can only be used in the iterative mode, lazy cuts cannot be removed")
+        if multipleSolutions and mode != 'iterative':
+            raise ValueError("Cuts from the solution pool can only be used in the iterative mode")
+        if localBranching > 0 and mode != 'iterative':
+            raise ValueError("Local branching can only be used in the iterative mode")
+        self.pareto = pareto
+        self.multipleSolutions = multipleSolutions
+        self.localBranching = localBranching
+        self.mode = mode
+        self.tol = tol
+        self.cutPool = cutPool
+        self.maxCutAge = maxCutAge
+        self.pool = None
+        self.trace = trace
+
+        start = time.time()
+        # The aggregated cuts only need the sums of mu and nu, the workers send them per chunk
+        self.subProblem = CustomerSubProblems(C, F, p, f, bigM, backend, nWorkers, aggregate=(cuts == 'aggregated'))
+        self.paretoSubProblem = UFLParetoSubProblem(C, F, p, f, bigM) if pareto is not None else None
+        self.buildTime = time.time() - start
+        # Core point for the Magnanti-Wong cuts, it is moved towards every evaluated x
+        self.corePoint = np.full(F, 0.5) if corePoint is None else np.asarray(corePoint, dtype=float)
+        self.resetStats()
+
+    def resetStats(self):
+        self.LB = -float("inf")
+        self.UB = float("inf")
+        self.xBest = None
+        self.yBest = None
+        self.stats = {'iterations': 0, 'masterSolves': 0, 'subProblems': 0, 'cuts': 0, 'cutsRemoved': 0,
+                      'time': 0.0, 'masterTime': 0.0, 'subProblemTime': 0.0, 'gap': float("inf")}
+        self.pool = CutPool(self.F, self.maxCutAge, self.tol) if self.cutPool else None
+        # Time of every phase since the last traced iteration
+        self.phaseTimes = dict.fromkeys(phases, 0.0)
+        self.tracedCuts = 0
+
+    def setupMasterProblemModel(self):
+        m = Model()
+        eta = self.cuts.addVariables(m)
+        x = [m.addVar(lb=0, vtype=GRB.BINARY, name=str(j)) for j in range(self.F)]
+        m.setObjective(quicksum(eta) - quicksum(self.f[j]*x[j] for j in range(self.F)), sense=GRB.MAXIMIZE)
+        m.Params.OutputFlag = 0
+        if self.mode == 'callback':
+            m.Params.lazyConstraints = 1
+        if self.multipleSolutions:
+            # Limit how many solutions to collect
+            m.setParam(GRB.Param.PoolSolutions, 500)
+            # Limit the search space by setting a gap for the worst possible solution
+            # that will be accepted
+            m.setParam(GRB.Param.PoolGap, 0.8)
+            # do a systematic search for the k-best solutions
+            m.setParam(GRB.Param.PoolSearchMode, 0)
+        m.update()
+        m._eta = eta
+        m._x = x
+        return m
+
+    def evaluate(self, x):
+        '''
+        Solves the subproblem in x, records the incumbent and returns (obj, mu, nu, status).
+        With a pareto strategy mu and nu are replaced by the duals of the pareto subproblem.
+        '''
+        start = time.time()
+        ob, mu, nu, status = self.subProblem.solveCuts(x)
+        self.stats['subProblems'] += 1
+        if ob > self.LB:
+            self.LB = ob
+            self.xBest = np.array(x, dtype=float)
+            # y is only gathered from the subproblems for a new incumbent
+            self.yBest = self.subProblem.solution()
+        self.phaseTimes['subProblem'] += time.time() - start
+        if status == OPTIMAL and self.pareto is not None:
+            startPareto = time.time()
+            if self.pareto == 'magnanti-wong':
+                self.corePoint = 0.5*(np.asarray(x, dtype=float) + self.corePoint)
+                rhs = self.bigM*self.corePoint
+            else:
+                rhs = np.full(self.F, 1 / self.bigM)
+            obp, mup, nup, yp, statusp = self.paretoSubProblem.solveArrays(x, ob, rhs)
+            if statusp == OPTIMAL:
+                mu, nu = mup, nup
+            self.phaseTimes['pareto'] += time.time() - startPareto
+        self.stats['subProblemTime'] += time.time() - start
+        return ob, mu, nu, status
+
+    def addCuts(self, m, mu, nu, status):
+        start = time.time()
+        if self.pool is not None:
+            etaIdx, const, coeff = self.cuts.cutRows(mu, nu, status)
+            self.stats['cuts'] += self.pool.addCuts(m, m._eta, m._x, etaIdx, const, coeff)
+        elif status == OPTIMAL:
+            self.stats['cuts'] += self.cuts.addOptimalityCuts(m, m._eta, m._x, mu, nu)
+        else:
+            self.stats['cuts'] += self.cuts.addFeasibilityCuts(m, m._x, mu, nu)
+        self.phaseTimes['cuts'] += time.time() - start
+
+    def solveMaster(self, m, phase='master'):
+        start = time.time()
+        m.optimize()
+        self.stats['masterTime'] += time.time() - start
+        self.phaseTimes[phase] += time.time() - start
+        self.stats['masterSolves'] += 1
+        if m.status != GRB.OPTIMAL:
+            raise RuntimeError("Sth went wrong in the master problem and it is {}".format(m.status))
+        return m.objVal, np.round(m.getAttr('X', m._x))
+
+    def poolSolutions(self, m):
+        start = time.time()
+        sols = []
+        for solNum in range(1, m.SolCount):
+            m.setParam(GRB.Param.SolutionNumber, solNum)
+            sols.append(np.round(m.getAttr('Xn', m._x)))
+        self.phaseTimes['solutionPool'] += time.time() - start
+        return sols
+
+    def solveLocalBranchingMaster(self, m):
+        '''
+        Solves the master in the neighbourhood of radius localBranching around the incumbent
+        '''
+        x = m._x
+        lhs = quicksum(1 - x[j] if self.xBest[j] > 0.5 else x[j] for j in range(self.F))
+        lbConstr = m.addConstr(lhs <= self.localBranching)
+        obj, xNew = self.solveMaster(m, 'localBranching')
+        m.remove(lbConstr)
+        return obj, xNew
+
+    def traceIteration(self, numVars, numConstrs):
+        '''
+        Records the phase times and counters of the iteration in the trace and resets the phase times
+        '''
+        event = {'event': 'iteration', 'iteration': self.stats['iterations'], 'LB': self.LB, 'UB': self.UB,
+                 'subProblems': self.stats['subProblems'], 'cutsAdded': self.stats['cuts'] - self.tracedCuts,
+                 'cuts': self.stats['cuts'], 'cutsRemoved': self.stats['cutsRemoved'],
+                 'masterVars': numVars, 'masterConstrs': numConstrs}
+        for phase in phases:
+            event[phase + 'Time'] = self.phaseTimes[phase]
+            self.phaseTimes[phase] = 0.0
+        self.tracedCuts = self.stats['cuts']
+        self.trace.record(event)
+
+    def printIteration(self, x):
+        print('----------------------iteration '  + str(self.stats['iterations']) +'-------------------' )
+        print ('LB = ', self.LB, ', UB = ', self.UB, ', tol = ', self.UB - self.LB)
+        if len([k for k in range(self.F) if round(x[k]) != 0]) != 0:
+            print('Opened Facilities: \t ', [k for k in range(self.F) if round(x[k]) != 0])
+        else:
+            print('No open facilities')
+
+    def solveIterative(self, eps, x_initial, maxit, verbose):
+        m = self.setupMasterProblemModel()
+        points = [np.asarray(x_initial, dtype=float)]
+        evaluated = set()
+        while self.stats['iterations'] < maxit:
+            for s in points:
+                evaluated.add(tuple(s))
+                ob, mu, nu, status = self.evaluate(s)
+                self.addCuts(m, mu, nu, status)
+
+            points = []
+            if self.localBranching > 0 and self.xBest is not None:
+                obj, x = self.solveLocalBranchingMaster(m)
+                if obj > self.LB + eps and tuple(x) not in evaluated:
+                    points = [x]
+            if len(points) == 0:
+                obj, x = self.solveMaster(m)
+                if self.pool is not None:
+                    start = time.time()
+                    # Cuts are only removed while the upper bound decreases, so the method cannot cycle
+                    self.stats['cutsRemoved'] += self.pool.update(m, obj < self.UB - eps)
+                    self.phaseTimes['cuts'] += time.time() - start
+                self.UB = min(self.UB, obj)
+                points = [x]
+                if self.multipleSolutions:
+                    for sol in self.poolSolutions(m):
+                        if tuple(sol) not in evaluated and not any(np.array_equal(sol, s) for s in points):
+                            points.append(sol)
+            self.stats['iterations'] += 1
+            if self.trace is not None:
+                self.traceIteration(m.NumVars, m.NumConstrs)
+            if verbose == 1:
+                self.printIteration(x)
+            if self.UB - self.LB <= eps:
+                break
+        return self.xBest, self.yBest, self.LB
+
+    def callBackFunction(self, model, where):
+        if where == GRB.Callback.MIPSOL:
+            xHat = np.round(model.cbGetSolution(model._x))
+            etaHat = np.array(model.cbGetSolution(model._eta))
+            ob, mu, nu, status = self.evaluate(xHat)
+            start = time.time()
+            self.stats['cuts'] += self.cuts.addLazyCuts(model, model._eta, model._x, etaHat, xHat, mu, nu, status, self.tol)
+            self.phaseTimes['cuts'] += time.time() - start
+            self.stats['iterations'] += 1
+            if self.trace is not None:
+                self.UB = model.cbGet(GRB.Callback.MIPSOL_OBJBND)
+                # The lazy cuts are not part of the model attributes
+                self.traceIteration(model.NumVars, model.NumConstrs + self.stats['cuts'])
+
+    def solveCallback(self, verbose):
+        m = self.setupMasterProblemModel()
+        start = time.time()
+        m.optimize(self.callBackFunction)
+        # The subproblems are solved inside the callback
+        self.stats['masterTime'] += time.time() - start - self.stats['subProblemTime']
+        self.stats['masterSolves'] += 1
+        self.UB = m.ObjVal
+        x = np.round(m.getAttr('X', m._x))
+        self.evaluate(x)
+        if round(self.LB) != round(self.UB):
+            print('Callback procedure failed')
+            print ('LB = ', self.LB, ', UB = ', self.UB)
+        if verbose == 1:
+            self.printIteration(x)
+        return self.xBest, self.yBest, self.LB
+
+    def solve(self, eps=0, x_initial=None, maxit=1000, verbose=0):
+        '''
+        Returns the best solution x, y found and its objective value
+        '''
+        self.resetStats()
+        if self.trace is not None:
+            self.trace.record({'event': 'setup', 'C': self.C, 'F': self.F, 'mode': self.mode, 'time': self.buildTime})
+        start = time.time()
+        if x_initial is None:
+            x_initial = np.ones(self.F)
+        if self.mode == 'iterative':
+            result = self.solveIterative(eps, x_initial, maxit, verbose)
+        else:
+            result = self.solveCallback(verbose)
+        self.stats['time'] = time.time() - start
+        self.stats['gap'] = (self.UB - self.LB) / max(1, abs(self.UB))
+        if self.trace is not None:
+            self.trace.record(dict(self.stats, event='end', LB=self.LB, UB=self.UB))
+        return result
+
+    def close(self):
+        self.subProblem.close()
+
+
+# Every variant of the Benders scripts as options of BendersUFL
+strategies = {
+    'classic': {},
+    'classic callback': {'mode': 'callback'},
+    'disaggregated': {'cuts': 'disaggregated'},
+    'disaggregated callback': {'cuts': 'disaggregated', 'mode': 'callback'},
+    'multiple cuts': {'multipleSolutions': True},
+    'multiple disaggregated cuts': {'cuts': 'disaggregated', 'multipleSolutions': True},
+    'multiple disaggregated cuts, pool': {'cuts': 'disaggregated', 'multipleSolutions': True, 'cutPool': True},
+    'pareto': {'pareto': 'magnanti-wong'},
+    'high density pareto': {'pareto': 'high-density'},
+    'local branching': {'localBranching': 2},
+}
+
+
+if __name__ == '__main__':
+    # All the strategies on the same instance
+    C, F, p, f = generateFacilityLocationData(100, 10, 3501)
+    x_initial = np.ones(F)
+    x_initial[2] = 0
+    for name in strategies:
+        solver = BendersUFL(C, F, p, f, 1, backend='analytic', **strategies[name])
+        xb, yb, obb = solver.solve(0, x_initial, 1000)
+        solver.close()
+        print("{:30s} obj = {:10.1f} iterations = {:5d} cuts = {:6d} took... {:6.2f} seconds".format(name, obb, solver.stats['iterations'], solver.stats['cuts'], solver.stats['time']))
+    start = time.time()
+    obg, xg, yg = solveModelGurobi(C, F, p, f)
+    print("{:30s} obj = {:10.1f} took... {:6.2f} seconds".format('gurobi', obg, time.time() - start))
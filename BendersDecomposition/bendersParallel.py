@@ -0,0 +1,176 @@
+'''
+Customer decomposed Benders subproblem of the Uncapacitated Facility Location (UFL) Problem
+
+For fixed x the subproblem is a collection of C independent problems, one per customer.
+The customers are split into chunks that are solved either in the current process (one
+batched NumPy kernel when backend='analytic') or by nWorkers long-lived worker processes.
+Every chunk belongs to one worker for the whole run, so its persistent model is built once
+and re-solved warm. Only the cut data goes back to the parent at every solve: mu and nu per
+customer, or with aggregate=True their sums per chunk, which give the same aggregated cut.
+The y of the last solve stays in the workers until solution() asks for it.
+
+    sp = CustomerSubProblems(C, F, p, f, bigM, backend='analytic', nWorkers=4)
+    ob, mu, nu, status = sp.solveCuts(x)
+    y = sp.solution()
+
+mu has C entries and nu is a C x F array (one row per chunk with aggregate=True). The Benders
+scripts run at import, so the workers are forked where it is available; with backend='gurobi'
+every worker creates its own Gurobi environment.
+'''
+
+
+import math
+import multiprocessing
+import numpy as np
+from gurobipy import *
+from bendersAnalytic import OPTIMAL, INFEASIBLE
+from bendersSubproblem import createSubProblem
+
+
+class ChunkGroup:
+    '''
+    The persistent subproblems of a set of chunks and the y of their last solve
+    '''
+    def __init__(self, p, bigM, backend, chunks, env=None):
+        # The facility costs are not part of the customer problems, they are added once by the caller
+        F = p.shape[1]
+        self.subProblems = {(start, end): createSubProblem(end - start, F, p[start:end], np.zeros(F), bigM, backend, env)
+                            for (start, end) in chunks}
+        self.y = {}
+
+    def solveCuts(self, x, aggregate):
+        results = []
+        for (start, end), subProblem in self.subProblems.items():
+            obj, mu, nu, y, status = subProblem.solveArrays(x)
+            self.y[start] = y
+            if aggregate:
+                mu, nu = np.array([mu.sum()]), nu.sum(axis=0)[None, :]
+            results.append((start, obj, mu, nu, status))
+        return results
+
+    def solution(self):
+        return list(self.y.items())
+
+
+def _worker(conn, p, bigM, backend, chunks, aggregate):
+    env = None
+    try:
+        if backend == 'gurobi':
+            env = Env()
+        group = ChunkGroup(p, bigM, backend, chunks, env)
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            elif isinstance(message, str):
+                conn.send(group.solution())
+            else:
+                conn.send(group.solveCuts(message, aggregate))
+    except Exception as error:
+        conn.send(error)
+    finally:
+        conn.close()
+        if env is not None:
+            env.dispose()
+
+
+class CustomerSubProblems:
+    def __init__(self, C, F, p, f, bigM, backend='analytic', nWorkers=1, chunkSize=None, aggregate=False):
+        self.C = C
+        self.F = F
+        self.p = np.asarray(p, dtype=float)
+        self.f = np.asarray(f, dtype=float)
+        self.bigM = bigM
+        self.nWorkers = nWorkers
+        self.aggregate = aggregate
+        if chunkSize is None:
+            chunkSize = C if nWorkers <= 1 else math.ceil(C / (4*nWorkers))
+        self.chunks = [(start, min(start + chunkSize, C)) for start in range(0, C, chunkSize)]
+        self.status = None
+
+        self.workers = []
+        self.connections = []
+        if nWorkers > 1:
+            if 'fork' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('fork')
+            else:
+                context = multiprocessing.get_context()
+            # Chunk k is always solved by worker k mod nWorkers
+            for k in range(min(nWorkers, len(self.chunks))):
+                parentConn, childConn = context.Pipe()
+                worker = context.Process(target=_worker, args=(childConn, self.p, bigM, backend, self.chunks[k::nWorkers], aggregate),
+                                         daemon=True)
+                worker.start()
+                childConn.close()
+                self.workers.append(worker)
+                self.connections.append(parentConn)
+            self.group = None
+        else:
+            self.group = ChunkGroup(self.p, bigM, backend, self.chunks)
+
+    def request(self, message):
+        # The message goes to all the workers before any answer is read, so they run in parallel
+        for conn in self.connections:
+            conn.send(message)
+        results = []
+        for conn in self.connections:
+            result = conn.recv()
+            if isinstance(result, Exception):
+                raise RuntimeError("A subproblem worker failed") from result
+            results += result
+        return sorted(results, key=lambda result: result[0])
+
+    def solveChunks(self, x):
+        x = np.asarray(x, dtype=float)
+        if self.group is not None:
+            return self.group.solveCuts(x, self.aggregate)
+        return self.request(x)
+
+    def solveCuts(self, x):
+        '''
+        Returns obj, mu, nu and status
+        '''
+        results = self.solveChunks(x)
+        obj = -float(self.f @ np.asarray(x, dtype=float))
+        status = OPTIMAL
+        for (start, chunkObj, chunkMu, chunkNu, chunkStatus) in results:
+            if chunkStatus == OPTIMAL:
+                obj += chunkObj
+            else:
+                status = INFEASIBLE
+        self.status = status
+        mu = np.concatenate([result[2] for result in results])
+        nu = np.vstack([result[3] for result in results])
+        if status == OPTIMAL:
+            return obj, mu, nu, status
+        else:
+            return -float("inf"), mu, nu, status
+
+    def solution(self):
+        '''
+        y (flattened C x F) of the last solveCuts, [] if it was infeasible
+        '''
+        if self.status != OPTIMAL:
+            return []
+        chunks = self.group.solution() if self.group is not None else self.request('solution')
+        return np.vstack([y for (start, y) in sorted(chunks, key=lambda chunk: chunk[0])]).ravel()
+
+    def solve(self, x):
+        '''
+        Returns obj, mu, nu, y (flattened C x F) and status
+        '''
+        obj, mu, nu, status = self.solveCuts(x)
+        return obj, mu, nu, self.solution(), status
+
+    def close(self):
+        for conn in self.connections:
+            try:
+                conn.send(None)
+            except OSError:
+                # The worker already stopped after an error
+                pass
+            conn.close()
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        self.connections = []
@@ -0,0 +1,192 @@
+'''
+Persistent Benders subproblems for the Uncapacitated Facility Location (UFL) Problem
+
+The subproblem models are built once and only their x-dependent data (right-hand
+sides, objective constant and, for the pareto subproblem, the coefficients of xi)
+are modified between Benders iterations. Gurobi keeps the previous basis of an
+unmodified model, so every re-solve is warm-started with the dual simplex.
+
+    sp = UFLSubProblem(C, F, p, f, bigM)
+    ob, mu, nu, y, status = sp.solve(x)
+
+solve(x) returns the same (obj, mu, nu, y, status) tuple as the old subProblem(x)
+functions of the Benders scripts. createSubProblem selects between this LP and the
+closed form solution of bendersAnalytic.py.
+'''
+
+
+import numpy as np
+from gurobipy import *
+from bendersAnalytic import AnalyticSubProblem
+
+
+class UFLSubProblem:
+    '''
+    MAXIMIZE      \sum_{i \in C} \sum_{j \in F} p_{ij} y_{ij} - \sum_{j \in F} f_j x_j
+    s.t.          \sum_{j \in F} y_{ij} = 1, \forall i \in C               (mu)
+                  y_{ij} <= bigM x_j, \forall i \in C, \forall j in F     (nu)
+                  y >= 0
+    '''
+    def __init__(self, C, F, p, f, bigM, env=None):
+        self.C = C
+        self.F = F
+        self.p = p
+        self.f = np.asarray(f, dtype=float)
+        self.bigM = bigM
+
+        m1 = Model(env=env)
+        y = m1.addVars(C, F, lb=0, vtype=GRB.CONTINUOUS)
+        m1.setAttr('Obj', [y[i, j] for i in range(C) for j in range(F)], [float(p[i, j]) for i in range(C) for j in range(F)])
+        constrMu = m1.addConstrs((y.sum(i, '*') == 1 for i in range(C)))
+        constrNu = m1.addConstrs((y[i, j] <= 0 for i in range(C) for j in range(F)))
+        m1.ModelSense = GRB.MAXIMIZE
+        m1.Params.OutputFlag = 0
+        m1.Params.InfUnbdInfo = 1
+        m1.Params.DualReductions = 0
+        # Only right hand sides change between iterations, so the previous basis stays dual feasible
+        m1.Params.Method = 1
+        m1.update()
+
+        self.model = m1
+        self.y = y
+        self.yList = [y[i, j] for i in range(C) for j in range(F)]
+        self.constrMu = constrMu
+        self.constrNu = constrNu
+        self.muList = [constrMu[i] for i in range(C)]
+        self.nuList = [constrNu[i, j] for i in range(C) for j in range(F)]
+
+    def update(self, x):
+        '''
+        Changes the bigM*x[j] right hand sides and the objective constant of the model
+        '''
+        x = np.asarray(x, dtype=float)
+        self.model.setAttr('RHS', self.nuList, np.tile(self.bigM*x, self.C).tolist())
+        self.model.ObjCon = -float(self.f @ x)
+
+    def solveArrays(self, x):
+        '''
+        Same as solve but mu (C), nu (C x F) and y (C x F) are returned as NumPy arrays
+        '''
+        m1 = self.model
+        self.update(x)
+        m1.optimize()
+
+        if m1.status == GRB.OPTIMAL:
+            mu = np.array(m1.getAttr('Pi', self.muList))
+            nu = np.array(m1.getAttr('Pi', self.nuList)).reshape(self.C, self.F)
+            y = np.array(m1.getAttr('X', self.yList)).reshape(self.C, self.F)
+            return m1.objVal, mu, nu, y, m1.status
+        else:
+            mu = np.array(m1.getAttr('FarkasDual', self.muList))
+            nu = np.array(m1.getAttr('FarkasDual', self.nuList)).reshape(self.C, self.F)
+            return -float("inf"), mu, nu, np.zeros((0, self.F)), m1.status
+
+    def solve(self, x):
+        m1 = self.model
+        self.update(x)
+        m1.optimize()
+
+        if m1.status == GRB.OPTIMAL:
+            mu = m1.getAttr('Pi', self.constrMu)
+            nu = m1.getAttr('Pi', self.constrNu)
+            return m1.objVal, mu, nu, m1.getAttr('X', self.yList), m1.status
+        else:
+            mu = m1.getAttr('FarkasDual', self.constrMu)
+            nu = m1.getAttr('FarkasDual', self.constrNu)
+            return -float("inf"), mu, nu, [], m1.status
+
+
+class UFLParetoSubProblem:
+    '''
+    Pareto subproblem shared by the Magnanti-Wong and the high density (Tang et al.) cuts
+
+    MAXIMIZE      \sum_{i \in C} \sum_{j \in F} p_{ij} y_{ij} + xi (sigma + \sum_{j \in F} f_j x_j) - \sum_{j \in F} f_j x_j
+    s.t.          \sum_{j \in F} y_{ij} + xi = 1, \forall i \in C               (mu)
+                  y_{ij} + bigM x_j xi <= rhs_j, \forall i \in C, \forall j in F   (nu)
+                  y >= 0, xi free
+
+    rhs_j is bigM*corePoint[j] for the Magnanti-Wong cuts and 1/bigM for the high density cuts.
+    '''
+    def __init__(self, C, F, p, f, bigM):
+        self.C = C
+        self.F = F
+        self.p = p
+        self.f = np.asarray(f, dtype=float)
+        self.bigM = bigM
+
+        m1 = Model()
+        y = m1.addVars(C, F, lb=0, vtype=GRB.CONTINUOUS)
+        m1.setAttr('Obj', [y[i, j] for i in range(C) for j in range(F)], [float(p[i, j]) for i in range(C) for j in range(F)])
+        xi = m1.addVar(lb=-GRB.INFINITY, vtype=GRB.CONTINUOUS)
+        constrMu = m1.addConstrs((y.sum(i, '*') + xi == 1 for i in range(C)))
+        constrNu = m1.addConstrs((y[i, j] + xi <= 0 for i in range(C) for j in range(F)))
+        m1.ModelSense = GRB.MAXIMIZE
+        m1.Params.OutputFlag = 0
+        m1.Params.InfUnbdInfo = 1
+        m1.Params.DualReductions = 0
+        m1.update()
+
+        self.model = m1
+        self.xi = xi
+        self.yList = [y[i, j] for i in range(C) for j in range(F)]
+        self.constrMu = constrMu
+        self.constrNu = constrNu
+        self.muList = [constrMu[i] for i in range(C)]
+        self.nuList = [constrNu[i, j] for i in range(C) for j in range(F)]
+        self.xCoeff = np.ones(F)
+
+    def update(self, x, sigma, rhs):
+        x = np.asarray(x, dtype=float)
+        m1 = self.model
+        coeff = self.bigM*x
+        # Only the coefficients of xi that really changed are touched
+        for j in np.nonzero(coeff != self.xCoeff)[0]:
+            for i in range(self.C):
+                m1.chgCoeff(self.constrNu[i, j], self.xi, coeff[j])
+        self.xCoeff = coeff
+        m1.setAttr('RHS', self.nuList, np.tile(np.asarray(rhs, dtype=float), self.C).tolist())
+        fx = float(self.f @ x)
+        self.xi.Obj = sigma + fx
+        m1.ObjCon = -fx
+
+    def solveArrays(self, x, sigma, rhs):
+        m1 = self.model
+        self.update(x, sigma, rhs)
+        m1.optimize()
+
+        if m1.status == GRB.OPTIMAL:
+            mu = np.array(m1.getAttr('Pi', self.muList))
+            nu = np.array(m1.getAttr('Pi', self.nuList)).reshape(self.C, self.F)
+            y = np.array(m1.getAttr('X', self.yList)).reshape(self.C, self.F)
+            return m1.objVal, mu, nu, y, m1.status
+        else:
+            mu = np.array(m1.getAttr('FarkasDual', self.muList))
+            nu = np.array(m1.getAttr('FarkasDual', self.nuList)).reshape(self.C, self.F)
+            return -float("inf"), mu, nu, np.zeros((0, self.F)), m1.status
+
+    def solve(self, x, sigma, rhs):
+        m1 = self.model
+        self.update(x, sigma, rhs)
+        m1.optimize()
+
+        if m1.status == GRB.OPTIMAL:
+            mu = m1.getAttr('Pi', self.constrMu)
+            nu = m1.getAttr('Pi', self.constrNu)
+            return m1.objVal, mu, nu, m1.getAttr('X', self.yList), m1.status
+        else:
+            mu = m1.getAttr('FarkasDual', self.constrMu)
+            nu = m1.getAttr('FarkasDual', self.constrNu)
+            return -float("inf"), mu, nu, [], m1.status
+
+
+def createSubProblem(C, F, p, f, bigM, backend='gurobi', env=None):
+    '''
+    backend is 'gurobi' for the persistent LP (built in env if given) or 'analytic' for the
+    closed form duals
+    '''
+    if backend == 'gurobi':
+        return UFLSubProblem(C, F, p, f, bigM, env)
+    elif backend == 'analytic':
+        return AnalyticSubProblem(C, F, p, f, bigM)
+    else:
+        raise ValueError("Subproblem backend ({:s}) is not recognized".format(backend))
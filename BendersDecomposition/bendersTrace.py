@@ -0,0 +1,67 @@
+'''
+Sinks for the per-iteration trace of BendersUFL (bendersEngine.py)
+
+When a sink is passed as BendersUFL(..., trace=sink), one event (a dict) is recorded per
+Benders iteration (per MIPSOL callback in the callback mode) with the time spent in every
+phase, the size of the master, the cut counts and the bounds. A 'setup' event with the
+subproblem build time is recorded before the first iteration and an 'end' event with the
+final stats after the last one. Without a sink no event is built.
+
+    trace = JSONLTrace('benders.jsonl')
+    solver = BendersUFL(C, F, p, f, bigM, trace=trace)
+    solver.solve(eps, x_initial, maxit)
+    trace.close()
+'''
+
+
+import csv
+import json
+
+
+phases = ['subProblem', 'pareto', 'cuts', 'master', 'solutionPool', 'localBranching']
+fields = ['event', 'iteration', 'LB', 'UB', 'subProblems', 'cutsAdded', 'cuts', 'cutsRemoved',
+          'masterVars', 'masterConstrs', 'time'] + [phase + 'Time' for phase in phases]
+
+
+class MemoryTrace:
+    '''
+    Keeps the events in the list self.events
+    '''
+    def __init__(self):
+        self.events = []
+
+    def record(self, event):
+        self.events.append(event)
+
+    def close(self):
+        pass
+
+
+class JSONLTrace:
+    '''
+    Writes one JSON object per line
+    '''
+    def __init__(self, fileName):
+        self.out = open(fileName, 'w')
+
+    def record(self, event):
+        self.out.write(json.dumps(event) + '\n')
+
+    def close(self):
+        self.out.close()
+
+
+class CSVTrace:
+    '''
+    Writes one row per event with the columns in fields
+    '''
+    def __init__(self, fileName):
+        self.out = open(fileName, 'w', newline='')
+        self.writer = csv.DictWriter(self.out, fieldnames=fields, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def record(self, event):
+        self.writer.writerow(event)
+
+    def close(self):
+        self.out.close()
@@ -5,16 +5,51 @@ Created on Mon May 24 06:47:31 2021
 @author: Pramesh Kumar
 """
 
+import os, sys
 import numpy as np
 from gurobipy import *
 import time, math
-
-
-def GenerateCuttingStockData():
-    n=12;
-    d=[20,13,17,18,20,45,13,50,20,35,20,30];
-    w=[29,75,58,32,18,47,24,62,70,33,21,41];
-    W=100;
+from knapsackPricing import solveKnapsack
+# The modules shared by the column generation scripts are in the parent folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from columnPool import ColumnPool
+from stabilization import stabilizedPricing
+
+
+def GenerateCuttingStockData(family='example', n=12, W=100, seed=0, v1=0.1, v2=0.5, dmax=100):
+    '''
+    Instance of a benchmark family, the items of equal width are aggregated with their demands
+        'example':   the 12 items instance with W=100
+        'uniform':   n widths uniform in [v1*W, v2*W] and demands uniform in [1, dmax] (CUTGEN like)
+        'falkenauerU': bin packing, n items of width uniform in [20, 100] and W=150
+        'falkenauerT': bin packing, n/3 triplets of widths in [250, 500] that fill exactly W=1000
+    '''
+    rng = np.random.default_rng(seed)
+    if family == 'example':
+        n=12;
+        d=[20,13,17,18,20,45,13,50,20,35,20,30];
+        w=[29,75,58,32,18,47,24,62,70,33,21,41];
+        W=100;
+    elif family == 'uniform':
+        widths = rng.integers(max(1, math.ceil(v1*W)), math.floor(v2*W) + 1, n)
+        demands = rng.integers(1, dmax + 1, n)
+    elif family == 'falkenauerU':
+        W = 150
+        widths = rng.integers(20, 101, n)
+        demands = np.ones(n, dtype=int)
+    elif family == 'falkenauerT':
+        W = 1000
+        first = rng.integers(380, 491, n//3)
+        second = rng.integers(250, (W - first)//2 + 1)
+        widths = np.concatenate([first, second, W - first - second])
+        demands = np.ones(len(widths), dtype=int)
+    else:
+        raise ValueError("Instance family ({:s}) is not recognized".format(family))
+    if family != 'example':
+        widths, index = np.unique(widths, return_inverse=True)
+        w = widths.tolist()
+        d = np.bincount(index, weights=demands).astype(int).tolist()
+        n = len(w)
 
     u=np.zeros(n) # no. of rolls of type i from one big roll
     for i in range(n):
@@ -29,7 +64,7 @@ def GenerateCuttingStockData():
     return n,d,w,u,W,nraw;
 
 
-def SolveCuttingStockModel(n,d,w,u,W,nraw,types):
+def SolveCuttingStockModel(n,d,w,u,W,nraw,types, verbose=1, timeLimit=None):
 
     val=-float("inf");
     # Step 0: start clock
@@ -57,7 +92,9 @@ def SolveCuttingStockModel(n,d,w,u,W,nraw,types):
     for j in range(nraw):
         m.addConstr(sum([w[i] * x[i, j] for i in range(n)]) <= W*y[j])
     
-    m.setObjective(obj, sense=GRB.MINIMIZE); m.update(); m.Params.OutputFlag = 1; m.Params.InfUnbdInfo = 1; m.Params.DualReductions = 0
+    m.setObjective(obj, sense=GRB.MINIMIZE); m.update(); m.Params.OutputFlag = verbose; m.Params.InfUnbdInfo = 1; m.Params.DualReductions = 0
+    if timeLimit is not None:
+        m.Params.TimeLimit = timeLimit
 
 
     # Step 2: Solve the model
@@ -65,13 +102,13 @@ def SolveCuttingStockModel(n,d,w,u,W,nraw,types):
     
 
     # Step 3: Display solution if required
-    if m.status == 2:        
+    if m.status == 2 and verbose >= 1:        
         print("---------------------------------------\n")
         print("Natural Formulation:",types)
         print(" {:6.2f} \n".format(m.objVal))
         print("---------------------------------------\n")
     
-        if (type=="IP"):
+        if (types=="IP"):
             for j in range(nraw):
                 valy=y[j].x
                 if (valy>1e-4):
@@ -93,13 +130,45 @@ def SolveCuttingStockModel(n,d,w,u,W,nraw,types):
     te = time.time();
     Deltat = (te-ts);
 
-    print("-----> Run time:      {:6.4f}\n\n".format(Deltat))
+    if (verbose>=1):
+        print("-----> Run time:      {:6.4f}\n\n".format(Deltat))
         
     # Step 5: output optimal value;
-    return m.objVal
+    return m.objVal if m.SolCount > 0 else float("inf")
 
 
-def SolveCuttingStockModelCG(n,d,w,u,W,nraw,type, verbsol):
+def SolveKnapsackPricing(subm, y, pi):
+    # Most valuable pattern for the duals pi with the integer Gurobi model
+    subm.setObjective(quicksum(pi[i] * y[i] for i in y), sense=GRB.MAXIMIZE)
+    subm.optimize()
+    return [(subm.objVal, np.array([round(y[i].x) for i in y]))]
+
+
+def StabilizedPricing(price, d, val, pi, center, alpha):
+    '''
+    Wentges smoothing (stabilization.stabilizedPricing) with the Farley bound d*sep/max(1, rc).
+    price(duals) returns the best patterns, best first. Returns the patterns sorted by their value
+    at pi, the best bound and its duals, the pricing calls and the mis-pricings.
+    '''
+    def evaluate(patterns):
+        patterns = sorted([(pi @ pattern, pattern) for (value, pattern) in patterns], key=lambda p: -p[0])
+        return patterns, patterns[0][0] > 1+1e-5
+    return stabilizedPricing(price, lambda sep, patterns: (d @ sep)/max(1, patterns[0][0]), evaluate, val, pi, center, alpha)
+
+
+def SolveCuttingStockModelCG(n,d,w,u,W,nraw,type, verbsol, stabilization=None, alpha=0.5, stats=None, pricing='dp', k=1, lpFile="CGmodel.lp", timeLimit=60, maxAge=20):
+    '''
+    stabilization=None prices at the duals of the master, 'wentges' at the smoothed duals (see
+    StabilizedPricing). If a list stats is given, one dictionary per iteration is appended.
+    pricing='dp' solves the knapsack with knapsackPricing.solveKnapsack and adds up to k patterns
+    per iteration, 'gurobi' with an integer model (one pattern per iteration).
+    The final master is written to lpFile unless it is None.
+    With type="IP" the LP is followed by a branch and price from its columns (at most timeLimit
+    seconds) and the number of rolls of the best integer plan is returned instead of the LP value.
+    The patterns are kept in a columnPool.ColumnPool: a pattern that is not basic for maxAge master
+    solves leaves the master, and it comes back before the knapsack is solved if its reduced cost
+    is negative again.
+    '''
 
     # Step 0: start clock
     ts = time.time();
@@ -130,110 +199,131 @@ def SolveCuttingStockModelCG(n,d,w,u,W,nraw,type, verbsol):
     if m.status == 2:
         val = m.objVal
         print("* Iteration {:3.1f}: {:7.3f}       ".format(t,val))
+    pool = ColumnPool(m, [demConstrs[i] for i in range(n)], maxAge)
+    for j in range(n):
+        pool.add(A[:, j], 1.0, key=A[:, j].astype(int).tobytes(), payload=A[:, j].astype(int), var=x[j])
 
         
-    # Step 5: Create and solve initial subproblem
-    subm = Model()
-    y = {i: subm.addVar(lb = 0.0, vtype = GRB.INTEGER, name = str(i)) for i in range(n)}
-    for j in range(n):
+    # Step 5: Create the subproblem
+    if pricing == 'dp':
+        price = lambda pi: solveKnapsack(pi, w, W, u, k)
+    elif pricing == 'gurobi':
+        subm = Model()
+        y = {i: subm.addVar(lb = 0.0, vtype = GRB.INTEGER, name = str(i)) for i in range(n)}
         subm.addConstr(sum([w[i]*y[i] for i in range(n)]) <= W)
-        
-        
-    subObj = sum([demConstrs[i].pi * y[i] for i in range(n)])
-    subm.setObjective(subObj, sense=GRB.MAXIMIZE); m.update(); m.Params.OutputFlag = verbsol; m.Params.InfUnbdInfo = 1; m.Params.DualReductions = 0
-
-    subm.optimize()
-    if subm.status == 2:
-        rc=subm.objVal;
-        print("// |rc| = {:7.3f} //       Pattern = [".format(rc-1))
-        for i in range(n):
-            print("{:3.0f},".format(round(y[i].x)))
-    
+        subm.Params.OutputFlag = verbsol; subm.Params.MIPGap = 0
+        price = lambda pi: SolveKnapsackPricing(subm, y, pi)
+    else:
+        raise ValueError("Pricing ({:s}) is not recognized".format(pricing))
+    dem = np.array(d, dtype=float)
+    LB = -float("inf"); center = None; pricingCalls = 0
     
 
     
 
 
-    # Step 6: Create names and matrices for new columns generated
-    newcols = [];
-    newpatterns =np.zeros((0,n), int)
-
-    # Step 7: Perform column generation
-    while (rc>1+1e-5):
-        # Step 7.1: Increase number of patterns added
+    # Step 6: Perform column generation
+    while True:
+        # Step 6.1: Bring back the patterns of the pool with a negative reduced cost
+        pi = np.array([demConstrs[i].pi for i in range(n)])
+        repriced = pool.reprice(pi)
+        if repriced > 0:
+            t+=1;
+            m.optimize()
+            val=m.objVal
+            pool.update()
+            print("* Iteration {:3.1f}: {:7.3f}       (pool)".format(t,val))
+            if stats is not None:
+                stats.append({'iteration': t, 'master': val, 'LB': LB, 'rc': None, 'pricingCalls': 0,
+                              'misprices': 0, 'columns': 0, 'repriced': repriced, 'time': time.time() - ts})
+            continue
+
+        # Step 6.2: Solve the subproblem
+        if stabilization is None:
+            patterns = price(pi)
+            LB = max(LB, (dem @ pi)/max(1, patterns[0][0])); calls = 1; misprices = 0
+        elif stabilization == 'wentges':
+            if center is None:
+                center = pi
+            patterns, newLB, newCenter, calls, misprices = StabilizedPricing(price, dem, val, pi, center, alpha)
+            if newLB > LB:
+                LB, center = newLB, newCenter
+        else:
+            raise ValueError("Stabilization ({:s}) is not recognized".format(stabilization))
+        pricingCalls += calls
+        rc, pattern = patterns[0]
+        print("// |rc| = {:7.3f} //       Pattern = [".format(rc-1))
+        for i in range(n):
+            print("{:3.0f},".format(pattern[i]))
+        if stats is not None:
+            stats.append({'iteration': t, 'master': val, 'LB': LB, 'rc': rc - 1, 'pricingCalls': calls,
+                          'misprices': misprices, 'columns': int(sum(p[0] > 1+1e-5 for p in patterns)), 'repriced': 0,
+                          'time': time.time() - ts})
+        # Stop when there is no improving pattern or the master value meets the bound
+        if rc <= 1+1e-5 or val - LB <= 1e-6*max(1, abs(val)):
+            break
+
+        # Step 6.3: Increase number of patterns added
         t+=1;
         
 
-        # Step 7.2: Add variable to master and record generated pattern
-        # Column is used for the added varaibles that are used to modify the constraints
-        c = Column()
-        for i in demConstrs:
-            c.addTerms(y[i].x, demConstrs[i])
-        
-        z = m.addVar(lb = 0.0, vtype = GRB.CONTINUOUS, name = str(len(x)), column = c)
+        # Step 6.4: Add the new patterns to the pool and to the master
+        for (rc, pattern) in patterns:
+            if rc <= 1+1e-5:
+                continue
+            pool.add(pattern, 1.0, key=pattern.astype(int).tobytes(), payload=pattern.astype(int))
         m.update()      
         
-        newcols.append(z)
-        newpatterns = np.append(newpatterns, np.array([[y[k].x for k in y]]), axis=0)
         
-        
-        # Step 7.3: Solve master model
+        # Step 6.5: Solve master model and age the patterns
         m.optimize()
         if m.status == 2:
             val=m.objVal
+        pool.update()
         print("* Iteration {:3.1f}: {:7.3f}       ".format(t,val))
-
-        # Step 7.4: Set the objective and solve new subproblem
-        subObj = sum([demConstrs[i].pi * y[i] for i in range(n)])
-        subm.setObjective(subObj, sense=GRB.MAXIMIZE); m.update()
-    
-        subm.optimize()
-        if subm.status == 2:
-            rc=subm.objVal;
-            print("// |rc| = {:7.3f} //       Pattern = [".format(rc-1))
-            for i in range(n):
-                print("{:3.0f},".format(round(y[i].x)))
             
 
 
     val=m.objVal;
 
-    # Step 8: Write lp model to a file
-    m.write("CGmodel.lp")
+    # Step 7: Write lp model to a file
+    if lpFile is not None:
+        m.write(lpFile)
 
-    # Step 9: Display solution obtained at the end of the CG algorithm
+    # Step 8: Display solution obtained at the end of the CG algorithm
     print("---------------------------------------\n")
     print("Solution (Relaxation): {:7.3f} \n".format(val))
     print("---------------------------------------\n")
 
-    for i in range(n):
-        newpat = x[i].x;
-        if (newpat>1e-4):
-            print("* Pattern {:3.0f}: [".format(i));
-            for j in range(n-1):
-                print("{:3.0f}, ".format(A[i,j]))
-            print("{:3.0f}]   .......   used {:7.3f} times \n".format(A[i,n-1],newpat))
-
-
-    for i in range(len(newcols)):
-        newpat= newcols[i].x;
+    for j in pool.active():
+        newpat = pool.value(j);
         if (newpat>1e-4):
-            print("* Pattern {:3.0f}: [".format(i+n));
-            for j in range(n-1):
-                print("{:3.0f}, ".format(round(newpatterns[i,j])))
-            print("{:3.0f}]   .......   used {:7.3f} times \n".format(round(newpatterns[i,n-1]),newpat))
+            print("* Pattern {:3.0f}: [".format(j));
+            for i in range(n-1):
+                print("{:3.0f}, ".format(pool.payloads[j][i]))
+            print("{:3.0f}]   .......   used {:7.3f} times \n".format(pool.payloads[j][n-1],newpat))
 
     print("---------------------------------------\n")
+    print("Pool: {:d} patterns, {:d} in the master, {:d} purged, {:d} brought back".format(
+        pool.size, len(pool.active()), pool.stats['purged'], pool.stats['repriced']))
 
 
-    # Step 11: Calculate solution time
+    # Step 9: Calculate solution time
     te = time.time();
     Deltat = (te-ts);
     if (verbsol>=1):
         print("-----> Run time:      {:6.4f}\n\n".format(Deltat))
+    print("Master solves", t, "pricing calls", pricingCalls)
+
+    # Step 10: Integer plan by branch and price from the generated columns
+    if (type=="IP"):
+        patterns = pool.payloads
+        val, LB, plan, nodes = SolveCuttingStockBranchAndPrice(n,d,w,u,W,patterns, verbsol, k, timeLimit)
+        for (pattern, times) in plan:
+            print("* Pattern [" + ", ".join("{:3.0f}".format(p) for p in pattern) + "]   .......   used {:5d} times".format(times))
 
 
-    # Step 12: return values
+    # Step 11: return values
     return(val)
 
 
@@ -241,17 +331,143 @@ def SolveCuttingStockModelCG(n,d,w,u,W,nraw,type, verbsol):
 
 
 
+def FirstFitDecreasing(d,w,W):
+    # Number of rolls and patterns of the first fit decreasing heuristic for the demands d
+    rolls = []; patterns = []
+    for i in sorted(range(len(w)), key=lambda i: -w[i]):
+        for copy in range(int(d[i])):
+            for r in range(len(rolls)):
+                if rolls[r] >= w[i]:
+                    rolls[r] -= w[i]; patterns[r][i] += 1
+                    break
+            else:
+                rolls.append(W - w[i]); patterns.append(np.zeros(len(w), dtype=int)); patterns[-1][i] = 1
+    return len(rolls), patterns
+
+
+def SolveCuttingStockBranchAndPrice(n,d,w,u,W,patterns, verbsol=0, k=5, timeLimit=60):
+    '''
+    Branch and price on the pattern variables, starting from the columns in the list patterns.
+    A branch is x_p >= ceil(x_p) (explored first, i.e. a dive) or x_p <= floor(x_p). The pricing
+    returns k + (number of columns at an upper bound) best patterns, so that the knapsack does not
+    have to be changed: the branched columns are already in the master and are skipped. All the
+    columns are kept in one master for all the nodes. A node is pruned when ceil of its LP value (or
+    of the Farley bound, before the node LP is solved) is at least the incumbent, which comes from
+    the integral master solutions and from rounding down plus first fit decreasing on the rest.
+    Every demand row has an artificial column of cost sum(d)+1, more than any plan needs, so the
+    master of a node is always feasible and the node is pruned as infeasible only when an
+    artificial column is still positive after the column generation has converged.
+    Returns the best number of rolls, the lower bound, the plan [(pattern, times), ...] and the nodes.
+    '''
+    ts = time.time()
+    dem = np.array(d, dtype=float)
+
+    # Step 1: Master with the initial columns and an incumbent from first fit decreasing
+    m = Model()
+    m.Params.OutputFlag = verbsol
+    demConstrs = [m.addConstr(LinExpr() >= d[i]) for i in range(n)]
+    penalty = sum(d) + 1
+    artificial = [m.addVar(lb = 0.0, obj = penalty, vtype = GRB.CONTINUOUS, column = Column([1.0], [demConstrs[i]])) for i in range(n)]
+    columns = []; keys = {}
+    def addColumn(pattern):
+        keys[tuple(pattern)] = len(columns)
+        columns.append((m.addVar(lb = 0.0, obj = 1.0, vtype = GRB.CONTINUOUS,
+                                 column = Column([pattern[i] for i in range(n) if pattern[i] > 0], [demConstrs[i] for i in range(n) if pattern[i] > 0])), pattern))
+    for pattern in patterns:
+        if tuple(pattern) not in keys:
+            addColumn(np.array(pattern, dtype=int))
+    UB, ffd = FirstFitDecreasing(d,w,W)
+    plan = [(p, 1) for p in ffd]
+
+    # Step 2: Depth first search, a node is (lower bound of the parent, {column: (lb, ub)})
+    nodes = [(0, {})]
+    branched = set()
+    LB = 0; count = 0
+    while nodes and time.time() - ts < timeLimit:
+        parentLB, bounds = nodes.pop()
+        if parentLB >= UB:
+            continue
+        count += 1
+        for j in branched:
+            columns[j][0].lb = 0.0; columns[j][0].ub = GRB.INFINITY
+        for j, (lb, ub) in bounds.items():
+            columns[j][0].lb = lb; columns[j][0].ub = ub
+
+        # Step 3: Column generation at the node
+        fixedUp = sum(ub < GRB.INFINITY for (lb, ub) in bounds.values())
+        nodeLB = parentLB
+        while True:
+            m.optimize()
+            pi = np.array(m.getAttr('Pi', demConstrs))
+            found = solveKnapsack(pi, w, W, u, k + fixedUp)
+            nodeLB = max(nodeLB, math.ceil((dem @ pi)/max(1, found[0][0]) - 1e-6))
+            new = [p for (value, p) in found if value > 1+1e-6 and tuple(p) not in keys][:k]
+            # The node LP cannot round up to less than the bound any more
+            if not new or nodeLB >= math.ceil(m.objVal - 1e-6) or nodeLB >= UB or time.time() - ts > timeLimit:
+                break
+            for p in new:
+                addColumn(p)
+        if not new:
+            nodeLB = max(nodeLB, math.ceil(m.objVal - 1e-6))
+            # No pattern can cover the demands the artificial columns still take, the node is infeasible
+            if sum(m.getAttr('X', artificial)) > 1e-6:
+                nodeLB = float("inf")
+        if count == 1:
+            LB = nodeLB
+        if nodeLB >= UB:
+            continue
+
+        # Step 4: Rounding heuristic, round down and first fit decreasing on the rest of the demands
+        x = np.array(m.getAttr('X', [c[0] for c in columns]))
+        A = np.array([c[1] for c in columns]).T
+        down = np.floor(x + 1e-6)
+        rolls, ffd = FirstFitDecreasing(np.maximum(dem - A @ down, 0), w, W)
+        if down.sum() + rolls < UB:
+            UB = int(down.sum()) + rolls
+            plan = [(columns[j][1], int(down[j])) for j in np.nonzero(down)[0]] + [(p, 1) for p in ffd]
+            if verbsol >= 1:
+                print("* Node {:5d}: new incumbent {:5d} rolls".format(count, UB))
+        if nodeLB >= UB:
+            continue
+
+        # Step 5: Branch on the most fractional column, the round up branch is explored first
+        frac = x - np.floor(x)
+        j = int(np.argmax(np.minimum(frac, 1 - frac)))
+        if min(frac[j], 1 - frac[j]) <= 1e-6:
+            continue
+        branched.add(j)
+        lb, ub = bounds.get(j, (0.0, GRB.INFINITY))
+        nodes.append((nodeLB, {**bounds, j: (lb, math.floor(x[j]))}))
+        nodes.append((nodeLB, {**bounds, j: (math.ceil(x[j]), ub)}))
+
+    # Step 6: The same pattern can be both in the rounded columns and in the first fit decreasing
+    times = {}
+    for (pattern, used) in plan:
+        times[tuple(pattern)] = times.get(tuple(pattern), 0) + used
+    plan = [(np.array(pattern), used) for (pattern, used) in times.items()]
+
+    # Step 7: The lower bound is the smallest one of the open nodes
+    if nodes:
+        LB = max(LB, min(UB, min(node[0] for node in nodes)))
+    else:
+        LB = UB
+    print("Branch and price: {:5d} rolls, lower bound {:5d}, gap {:6.2f}%, {:5d} nodes, {:6d} columns, {:6.2f} seconds".format(
+        UB, LB, 100*(UB - LB)/max(1, UB), count, len(columns), time.time() - ts))
+    return UB, LB, plan, count
+
+
 ############################################################################################################
 
-# Step 1: Define dimensions and parameters
+if __name__ == '__main__':
+    # Step 1: Define dimensions and parameters
 
-n,d,w,u,W,nraw = GenerateCuttingStockData();
+    n,d,w,u,W,nraw = GenerateCuttingStockData();
 
 
 
-# Step 2: Solve column generation
-vallp3 = SolveCuttingStockModelCG(n,d,w,u,W,nraw,"IP", 0)
+    # Step 2: Solve column generation
+    vallp3 = SolveCuttingStockModelCG(n,d,w,u,W,nraw,"IP", 0)
 
-# Step 3: 
-#vallp1 = SolveCuttingStockModel(n,d,w,u,W,nraw,"LP");
-#valip1 = SolveCuttingStockModel(n,d,w,u,W,nraw,"IP");
+    # Step 3: 
+    #vallp1 = SolveCuttingStockModel(n,d,w,u,W,nraw,"LP");
+    #valip1 = SolveCuttingStockModel(n,d,w,u,W,nraw,"IP");
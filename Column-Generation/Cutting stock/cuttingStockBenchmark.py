@@ -0,0 +1,110 @@
+'''
+Benchmark of the natural formulation against the column generation for the cutting stock problem
+
+For every family, size and seed of GenerateCuttingStockData (D-W_cutting_stock.py) the natural
+LP and IP (SolveCuttingStockModel) and the column generation (SolveCuttingStockModelCG) are run.
+One record per (instance, method) is written to a CSV and a JSON file with the time, the
+iterations, the columns, the pricing calls and the value (LP bound for 'LP' and 'CG'), and for
+the branch and price ('B&P') the number of rolls, the lower bound, the gap and the nodes.
+
+    records = runBenchmark(instances, seeds, methods, 'cuttingStockBenchmark')
+'''
+
+
+import contextlib, csv, importlib.util, io, json, math, os, time
+import numpy as np
+from gurobipy import *
+
+# The file name has a hyphen, it cannot be imported with an import statement
+spec = importlib.util.spec_from_file_location('cuttingStock', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'D-W_cutting_stock.py'))
+cuttingStock = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(cuttingStock)
+
+
+fields = ['family', 'n', 'W', 'seed', 'items', 'method', 'status', 'obj', 'roundedUp', 'LB', 'gap', 'time',
+          'iterations', 'columns', 'pricingCalls', 'variables', 'nodes']
+
+# name: (function, options)
+methods = {'LP': ('natural', {'types': 'LP'}),
+           'IP': ('natural', {'types': 'IP'}),
+           'CG': ('CG', {'pricing': 'dp', 'k': 1}),
+           'CG k=5': ('CG', {'pricing': 'dp', 'k': 5}),
+           'CG gurobi': ('CG', {'pricing': 'gurobi', 'k': 1}),
+           'CG k=5, wentges': ('CG', {'pricing': 'dp', 'k': 5, 'stabilization': 'wentges'}),
+           'B&P': ('BP', {'k': 5})}
+
+
+def runMethod(n, d, w, u, W, nraw, name, timeLimit):
+    kind, options = methods[name]
+    record = {'method': name, 'status': 'ok'}
+    start = time.time()
+    try:
+        # The solvers print every iteration
+        with contextlib.redirect_stdout(io.StringIO()):
+            if kind == 'natural':
+                record['obj'] = cuttingStock.SolveCuttingStockModel(n, d, w, u, W, nraw, options['types'], 0, timeLimit)
+                record['variables'] = (n + 1)*nraw
+            elif kind == 'CG':
+                stats = []
+                record['obj'] = cuttingStock.SolveCuttingStockModelCG(n, d, w, u, W, nraw, "LP", 0, stats=stats, lpFile=None, **options)
+                record['iterations'] = stats[-1]['iteration']
+                record['columns'] = n + sum(s['columns'] for s in stats)
+                record['pricingCalls'] = sum(s['pricingCalls'] for s in stats)
+                record['variables'] = record['columns']
+            else:
+                # Branch and price from the patterns with one item type
+                patterns = [np.eye(n, dtype=int)[i]*int(u[i]) for i in range(n)]
+                record['obj'], record['LB'], plan, record['nodes'] = cuttingStock.SolveCuttingStockBranchAndPrice(
+                    n, d, w, u, W, patterns, 0, options['k'], timeLimit)
+                record['gap'] = (record['obj'] - record['LB'])/max(1, record['obj'])
+        if record['obj'] == float("inf"):
+            record['status'] = 'no solution'
+            del record['obj']
+        else:
+            record['roundedUp'] = math.ceil(record['obj'] - 1e-6)
+    except GurobiError as e:
+        record['status'] = str(e)
+    record['time'] = time.time() - start
+    return record
+
+
+def runBenchmark(instances, seeds, methodNames, fileName=None, timeLimit=60, verbose=1):
+    '''
+    instances is a list of (family, n, W), returns the list of records, also written to
+    fileName.csv and fileName.json if fileName is given
+    '''
+    records = []
+    for (family, size, width) in instances:
+        for seed in seeds:
+            n, d, w, u, W, nraw = cuttingStock.GenerateCuttingStockData(family, size, width, seed)
+            for name in methodNames:
+                record = runMethod(n, d, w, u, W, nraw, name, timeLimit)
+                record.update({'family': family, 'n': size, 'W': W, 'seed': seed, 'items': n})
+                records.append(record)
+                if verbose == 1:
+                    print("{:12s} n = {:5d} W = {:6d} seed = {:4d} {:18s} obj = {} took... {:8.2f} seconds".format(
+                        family, size, W, seed, name, record.get('obj', record['status']), record['time']))
+
+    if fileName is not None:
+        writeRecords(records, fileName)
+    return records
+
+
+def writeRecords(records, fileName):
+    with open(fileName + '.csv', 'w', newline='') as out:
+        writer = csv.DictWriter(out, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(records)
+    with open(fileName + '.json', 'w') as out:
+        json.dump(records, out, indent=1)
+
+
+if __name__ == '__main__':
+    # Step 1: Instances and methods
+    instances = [('example', 12, 100), ('uniform', 20, 1000), ('uniform', 50, 10000), ('uniform', 200, 10000),
+                 ('falkenauerU', 120, 150), ('falkenauerU', 250, 150), ('falkenauerT', 60, 1000), ('falkenauerT', 120, 1000)]
+    seeds = [0, 1, 2]
+    # Step 2: Run and save the results
+    start = time.time()
+    runBenchmark(instances, seeds, list(methods), 'cuttingStockBenchmark')
+    print("Benchmark took...", round(time.time() - start, 2), "seconds")
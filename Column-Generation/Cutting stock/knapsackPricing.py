@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Pricing problem of the cutting stock column generation, a bounded integer knapsack
+
+    max  \sum_i values_i y_i   s.t.  \sum_i weights_i y_i <= W,  0 <= y_i <= bounds_i integer
+
+solved without a MIP solver. Both methods return the k best distinct patterns, best first:
+    - knapsackDP: dynamic program over the capacity with NumPy arrays. For every item i and
+      capacity c it keeps the k best values of the patterns of the items 0..i of width at most c,
+      so it takes O(k W \sum_i bounds_i) operations and O(k W (n + max_i bounds_i)) memory
+      (integer widths only).
+    - knapsackBB: depth first branch and bound on the items sorted by value per unit of width,
+      pruned with the LP (Dantzig) bound against the k-th best pattern found, for large W.
+
+    patterns = solveKnapsack(pi, w, W, u, k=5)   # [(value, pattern), ...]
+"""
+import heapq, itertools
+import numpy as np
+
+
+def knapsackDP(values, weights, W, bounds, k=1):
+    n = len(values)
+    values = np.asarray(values, dtype=float)
+    # best[c, r]: r-th best value of width at most c, the empty pattern to start with
+    best = np.full((W + 1, k), -np.inf)
+    best[:, 0] = 0.0
+    copies = np.zeros((n, W + 1, k), dtype=np.int32)
+    rank = np.zeros((n, W + 1, k), dtype=np.int32)
+    rank[:] = np.arange(k)
+    for i in range(n):
+        if values[i] <= 0 or weights[i] > W:
+            continue
+        # Candidates with t = 0..T copies of item i added to the k best patterns of the items 0..i-1
+        T = min(int(bounds[i]), W // weights[i])
+        candidates = np.full((W + 1, T + 1, k), -np.inf)
+        for t in range(T + 1):
+            candidates[t*weights[i]:, t] = best[:W + 1 - t*weights[i]] + t*values[i]
+        candidates = candidates.reshape(W + 1, (T + 1)*k)
+        if k == 1:
+            order = np.argmax(candidates, axis=1)[:, None]
+        else:
+            order = np.argsort(-candidates, axis=1, kind='stable')[:, :k]
+        best = np.take_along_axis(candidates, order, axis=1)
+        copies[i], rank[i] = order // k, order % k
+
+    # Follow the copies back from the capacity W
+    patterns = []
+    for top in range(k):
+        if best[W, top] == -np.inf:
+            break
+        pattern = np.zeros(n, dtype=int)
+        r, c = top, W
+        for i in reversed(range(n)):
+            pattern[i] = copies[i, c, r]
+            r, c = rank[i, c, r], c - pattern[i]*weights[i]
+        patterns.append((best[W, top], pattern))
+    return patterns
+
+
+def knapsackBB(values, weights, W, bounds, k=1):
+    n = len(values)
+    items = sorted([i for i in range(n) if values[i] > 0 and bounds[i] > 0 and weights[i] <= W],
+                   key=lambda i: -values[i]/weights[i])
+    found = []
+    counter = itertools.count()
+    pattern = np.zeros(n, dtype=int)
+
+    def upperBound(j, cap):
+        # LP bound of the items items[j:] with the capacity cap
+        ub = 0.0
+        for i in items[j:]:
+            t = min(bounds[i], cap/weights[i])
+            ub += t*values[i]
+            cap -= t*weights[i]
+            if cap <= 0:
+                break
+        return ub
+
+    def search(j, cap, value):
+        if len(found) == k and value + upperBound(j, cap) <= found[0][0] + 1e-12:
+            return
+        if j == len(items):
+            # Ties are broken by the order in which the patterns are found
+            entry = (value, -next(counter), pattern.copy())
+            if len(found) < k:
+                heapq.heappush(found, entry)
+            elif value > found[0][0]:
+                heapq.heapreplace(found, entry)
+            return
+        i = items[j]
+        for t in range(int(min(bounds[i], cap // weights[i])), -1, -1):
+            pattern[i] = t
+            search(j + 1, cap - t*weights[i], value + t*values[i])
+        pattern[i] = 0
+
+    search(0, W, 0.0)
+    return [(value, p) for (value, tie, p) in sorted(found, key=lambda e: (-e[0], -e[1]))]
+
+
+def solveKnapsack(values, weights, W, bounds, k=1, maxCells=2e7):
+    '''
+    k best patterns of the bounded knapsack, with the dynamic program when its tables have at
+    most maxCells entries and the branch and bound otherwise
+    '''
+    weights = [int(wi) for wi in weights]
+    # Tables of the copies and ranks plus the candidates of the item with the most copies
+    copies = max([min(int(bounds[i]), int(W) // weights[i]) for i in range(len(weights))] + [0]) + 1
+    if (len(values) + copies)*(W + 1)*k <= maxCells:
+        return knapsackDP(values, weights, int(W), bounds, k)
+    return knapsackBB(values, weights, W, bounds, k)
@@ -4,9 +4,15 @@ Created on Tue May 25 10:45:59 2021
 
 @author: Pramesh Kumar
 """
-import math, time, heapq
+import math, os, sys, time
 import numpy as np
 from gurobipy import *
+from networkGraph import loadNetwork, dijkstra, tracePreds, ShortestPathQuery
+from rcspLabeling import RCSPPricer
+# The modules shared by the column generation scripts are in the parent folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from columnPool import ColumnPool
+from stabilization import stabilizedPricing
 
 inputLocation = "Sioux Falls network/"
 
@@ -18,149 +24,99 @@ class Zone:
         self.destList = []
 
 
-class Node:
-    '''
-    This class has attributes associated with any node
-    '''
-    def __init__(self, _tmpIn):
-        self.Id = _tmpIn[0]
-        self.lat = 0
-        self.lon = 0
-        self.outLinks = []
-        self.inLinks = []
-        self.label = float("inf")
-        self.pred = ""
-        self.inDegree = 0
-        self.outDegree = 0
-        self.order = 0 # Topological order
-        self.wi = 0.0 # Weight of the node in Dial's algorithm
-        self.xi = 0.0 # Toal flow crossing through this node in Dial's algorithm
-
-
-class Link:
-    '''
-    This class has attributes associated with any link
-    '''
-    def __init__(self, _tmpIn):
-        self.tailNode = _tmpIn[0]
-        self.headNode = _tmpIn[1]
-        self.capacity = float(_tmpIn[2]) # veh per hour
-        self.length = float(_tmpIn[3]) # Length
-        self.fft = float(_tmpIn[4]) # Free flow travel time (min)
-        self.beta = float(_tmpIn[6])
-        self.alpha = float(_tmpIn[5])
-        self.speedLimit = float(_tmpIn[7])
-        #self.toll = float(_tmpIn[9])
-        #self.linkType = float(_tmpIn[10])
-        self.flow = 0.0
-        self.cost =  float(_tmpIn[4]) #float(_tmpIn[4])*(1 + float(_tmpIn[5])*math.pow((float(_tmpIn[7])/float(_tmpIn[2])), float(_tmpIn[6])))
-        self.cost_derivative = 0.0 # For CFW 
-        self.target = 0.0  # For CFW
-        self.logLike = 0.0
-        self.reasonable = True # This is for Dial's stochastic loading
-        self.wij = 0.0 # Weight in the Dial's algorithm
-        self.xij = 0.0 # Total flow on the link for Dial's algorithm
-        self.resource = 0.0
-
-
-
-
 def readNetwork():
-    inFile = open(inputLocation + "network.dat")
-    tmpIn = inFile.readline().strip().split("\t")
-    for x in inFile:
-        tmpIn = x.strip().split("\t")
-        linkSet[tmpIn[0], tmpIn[1]] = Link(tmpIn)
-        if tmpIn[0] not in nodeSet:
-            nodeSet[tmpIn[0]] = Node(tmpIn[0])
-        if tmpIn[1] not in nodeSet:
-            nodeSet[tmpIn[1]] = Node(tmpIn[1])
-        if tmpIn[1] not in nodeSet[tmpIn[0]].outLinks:
-            nodeSet[tmpIn[0]].outLinks.append(tmpIn[1])
-        if tmpIn[0] not in nodeSet[tmpIn[1]].inLinks:
-            nodeSet[tmpIn[1]].inLinks.append(tmpIn[0])
+    network = loadNetwork(inputLocation + "network.dat")
+    print(network.numNodes, "nodes")
+    print(network.numLinks, "links")
+    return network
 
-    inFile.close()
-    print(len(nodeSet), "nodes")
-    print(len(linkSet), "links")
-    
 def assignResources():
     np.random.seed(15645)
-    for l in linkSet:
-        linkSet[l].resource = np.random.randint(8)
-    
+    network.resource = np.random.randint(8, size=network.numLinks).astype(float)
+
 ###########################################################################################################################
+def linkCosts(cost, dual):
+    if cost == 'fft':
+        return network.fft
+    elif cost == 'resource':
+        return network.resource
+    elif cost == 'pricing':
+        return network.fft - network.resource*dual
+
 def DijkstraHeap(origin, cost, dual):
     '''
     Calcualtes shortest path from an origin to all other destinations.
-    The labels and preds are stored in node instances.
+    Returns the labels and the predecessor links of the nodes (see networkGraph.py).
     '''
-    for n in nodeSet:
-        nodeSet[n].label = float("inf")
-        nodeSet[n].pred = ""
-    nodeSet[origin].label = 0.0
-    nodeSet[origin].pred = "NA"
-    SE = [(0, origin)]
-    while SE:
-        currentNode = heapq.heappop(SE)[1]
-        currentLabel = nodeSet[currentNode].label
-        for toNode in nodeSet[currentNode].outLinks:
-            link = (currentNode, toNode)
-            newNode = toNode
-            newPred =  currentNode
-            existingLabel = nodeSet[newNode].label
-            if cost == 'fft':                
-                newLabel = currentLabel + linkSet[link].fft
-            elif cost == 'resource':
-                newLabel = currentLabel + linkSet[link].resource
-            elif cost == 'pricing':
-                newLabel = currentLabel + (linkSet[link].fft - linkSet[link].resource*dual)
-                
-            if newLabel < existingLabel:
-                heapq.heappush(SE, (newLabel, newNode))
-                nodeSet[newNode].label = newLabel
-                nodeSet[newNode].pred = newPred
-                
-def tracePreds(dest):
-   '''
-   This method traverses predecessor nodes in order to create a shortest path
-   '''
-   prevNode = nodeSet[dest].pred
-   spLinks = []
-   while nodeSet[dest].pred != "NA":
-       spLinks.append((prevNode, dest))
-       dest = prevNode
-       prevNode = nodeSet[dest].pred
-   return spLinks   
+    return dijkstra(network, network.nodeIndex[origin], linkCosts(cost, dual))
+
+def ShortestPath(origin, dest, cost, dual, mode='dijkstra'):
+    '''
+    Shortest path from origin to dest only, the search stops when dest is settled.
+    mode is 'dijkstra', 'bidirectional' or 'astar' (only for the costs >= fft, i.e. 'fft' and 'pricing').
+    Returns the length and the links of the path from dest back to origin.
+    '''
+    return spQuery.path(network.nodeIndex[origin], network.nodeIndex[dest], linkCosts(cost, dual), mode)
+
 
-      
 def gurobiModel(o, d):
     print("---------------------------------------\n")
     print("Solving using gurobi: \n")
     print("---------------------------------------\n")
     m = Model()
-    x = {k: m.addVar(lb = 0.0, vtype = GRB.CONTINUOUS, name = str(k[0]) + "," + str(k[1])) for k in linkSet}
-    x['o',o] = m.addVar(lb = 0.0, vtype = GRB.CONTINUOUS, name = "o," + str(o))
-    x[d,'d'] = m.addVar(lb = 0.0, vtype = GRB.CONTINUOUS, name = "d," + str(d))
-    m.update()
-    m.addConstr(x['o',o] == 1); m.addConstr(x[d,'d'] == 1)
-    
-    for i in nodeSet:
-        if i == o:
-            m.addConstr(sum([x[i, j] for j in nodeSet[i].outLinks]) - sum([x[j, i] for j in nodeSet[i].inLinks]) - x['o',o] == 0)
-        elif i == d:
-            m.addConstr(sum([x[i, j] for j in nodeSet[i].outLinks]) + x[d,'d'] - sum([x[j, i] for j in nodeSet[i].inLinks]) == 0)
-        else:                        
-            m.addConstr(sum([x[i, j] for j in nodeSet[i].outLinks]) - sum([x[j, i] for j in nodeSet[i].inLinks]) == 0)
-
-    m.addConstr(sum([x[k]*linkSet[k].resource for k in linkSet]) <= 4)    
-    obj = sum([x[k]*linkSet[k].fft for k in linkSet])    
+    x = m.addMVar(network.numLinks, lb = 0.0, vtype = GRB.CONTINUOUS)
+    # One unit leaves o and arrives at d
+    b = np.zeros(network.numNodes)
+    b[network.nodeIndex[o]] = 1; b[network.nodeIndex[d]] = -1
+    m.addMConstr(network.incidence(), x, GRB.EQUAL, b)
+
+    m.addConstr(network.resource @ x <= 4)
+    obj = network.fft @ x
     m.setObjective(obj, sense=GRB.MINIMIZE); m.update(); m.Params.OutputFlag = 0; m.Params.InfUnbdInfo = 1; m.Params.DualReductions = 0
     m.optimize()
     print('Final path found')
-    print({l for l in linkSet if x[l].x != 0})
+    print(set(network.linkIds(np.nonzero(x.X != 0)[0])))
     print('ObjVal', m.objVal)
-def SPRC_CG(o, d):
+def pricePaths(o, d, resDual, convDual, pricing, k, bidirectional):
+    '''
+    Paths with a negative reduced cost, 'dijkstra' is the Lagrangian pricing (the resource
+    budget is only in the master) and 'labeling' the resource constrained label setting.
+    Also returns a lower bound on the cost fft - resDual*resource of the paths of the pricing
+    problem (the exact minimum when a path is found).
+    '''
+    if pricing == 'dijkstra':
+        dist, path = ShortestPath(o, d, 'pricing', resDual, 'bidirectional' if bidirectional else 'astar')
+        reducedCost = dist - convDual
+        return ([path] if reducedCost < 0-1e-5 else []), dist
+    elif pricing == 'labeling':
+        cost = network.fft - network.resource*resDual
+        paths = pricer.price(network.nodeIndex[o], network.nodeIndex[d], cost, convDual - 1e-5, k, bidirectional)
+        return [p[2] for p in paths], (paths[0][0] if paths else convDual - 1e-5)
+    else:
+        raise ValueError("Pricing ({:s}) is not recognized".format(pricing))
+
+def reducedCost(path, resDual, convDual):
+    return network.fft[path].sum() - resDual*network.resource[path].sum() - convDual
+
+def smoothedPricing(o, d, val, duals, center, alpha, pricing, k, bidirectional):
+    '''
+    Wentges smoothing (stabilization.stabilizedPricing) with the Lagrangian bound 4*sep[0] + the
+    cost of the best path. Returns the paths with a negative reduced cost at the master duals, the
+    best bound and its duals, the pricing calls and the mis-pricings.
+    '''
+    def evaluate(result):
+        paths = [p for p in result[0] if reducedCost(p, duals[0], duals[1]) < 0-1e-5]
+        return paths, len(paths) > 0
+    return stabilizedPricing(lambda sep: pricePaths(o, d, sep[0], sep[1], pricing, k, bidirectional),
+                             lambda sep, result: sep[0]*4 + result[1], evaluate, val, duals, center, alpha)
+
+def SPRC_CG(o, d, pricing='labeling', k=1, bidirectional=False, stabilization=None, alpha=0.5, stats=None, maxAge=20):
+    '''
+    stabilization=None prices at the duals of the master, 'wentges' at the smoothed duals (see
+    smoothedPricing). If a list stats is given, one dictionary per iteration is appended.
+    The paths are kept in a columnPool.ColumnPool: a path that is not basic for maxAge master
+    solves leaves the master and comes back when its reduced cost is negative again.
+    '''
     val=-float("inf");
     # Step 0: start clock
     ts = time.time();
@@ -174,8 +130,7 @@ def SPRC_CG(o, d):
     print("---------------------------------------\n")
 
     # Step 3: Generate a first collection of simple path using shortest path alg.
-    DijkstraHeap(o, 'resource', 0)
-    paths = {0:tracePreds(d)}
+    paths = {0:ShortestPath(o, d, 'resource', 0)[1]}
     
     # Step 4: 
     m = Model()
@@ -183,8 +138,8 @@ def SPRC_CG(o, d):
     m.update()
     tempSum = 0; obj = 0
     for p in paths:
-        tempSum += sum([linkSet[k].resource for k in paths[p]])*lamb[p] 
-        obj += sum([linkSet[k].fft for k in paths[p]])*lamb[p] 
+        tempSum += network.resource[paths[p]].sum()*lamb[p]
+        obj += network.fft[paths[p]].sum()*lamb[p]
     resConstr = m.addConstr(tempSum <= 4)
     convConstr = m.addConstr(sum([lamb[p] for p in paths]) == 1)
 
@@ -194,49 +149,65 @@ def SPRC_CG(o, d):
     if m.status == 2:
         val = m.objVal
         print("* Iteration {:3.1f}: {:7.3f}       ".format(t,val))
+    pool = ColumnPool(m, [resConstr, convConstr], maxAge)
+    pool.add([network.resource[paths[0]].sum(), 1.0], network.fft[paths[0]].sum(), tuple(paths[0]), paths[0], lamb[0])
         
     
     
-    # Step 5: Solve initial subproblem using shortest path
-    DijkstraHeap(o, 'pricing', resConstr.pi)
-    reducedCost = nodeSet[d].label - convConstr.pi
-    
-    
-    while reducedCost < 0-1e-5:
+    # Step 5: Solve initial subproblem
+    LB = -float("inf"); center = None; pricingCalls = 0
+    while True:
+        duals = np.array([resConstr.pi, convConstr.pi])
+        # Step 6: Bring back the paths of the pool with a negative reduced cost
+        repriced = pool.reprice(duals)
+        if repriced > 0:
+            t+=1;
+            m.optimize()
+            val=m.objVal
+            pool.update()
+            print("* Iteration {:3.1f}: {:7.3f}       (pool)".format(t,val))
+            continue
+        if stabilization is None:
+            newPaths, minCost = pricePaths(o, d, duals[0], duals[1], pricing, k, bidirectional)
+            LB = max(LB, duals[0]*4 + minCost); calls = 1; misprices = 0
+        elif stabilization == 'wentges':
+            if center is None:
+                center = duals
+            newPaths, newLB, newCenter, calls, misprices = smoothedPricing(o, d, val, duals, center, alpha, pricing, k, bidirectional)
+            if newLB > LB:
+                LB, center = newLB, newCenter
+        else:
+            raise ValueError("Stabilization ({:s}) is not recognized".format(stabilization))
+        pricingCalls += calls
+        if stats is not None:
+            stats.append({'iteration': t, 'master': val, 'LB': LB, 'pricingCalls': calls,
+                          'misprices': misprices, 'columns': len(newPaths), 'time': time.time() - ts})
+        # Stop when the master has no improving column or its value meets the Lagrangian bound
+        if not newPaths or val - LB <= 1e-6*max(1, abs(val)):
+            break
         
         # Step 7.1: Increase number of patterns added
         t+=1;
         
-        # Step 7.1: Include new path with the reduced cost
-        p =  tracePreds(d)
-        paths[len(paths)] = p
-        
-        
-        # Step 7.2: Add lambda variable of new path to master
-        # Column is used for the added variables that are used to modify the constraints
-        c = Column()
-        
-        c.addTerms(sum([linkSet[k].resource for k in p]), resConstr)
-        c.addTerms(1.0, convConstr)
-        
-        lamb[len(lamb)] = m.addVar(lb = 0.0, vtype = GRB.CONTINUOUS, name = str(len(lamb)), column = c)
+        for p in newPaths:
+            # Step 7.2: Add the new path to the pool and its lambda variable to the master
+            pool.add([network.resource[p].sum(), 1.0], network.fft[p].sum(), tuple(p), p)
         m.update()
         
-        # Step 7.3: Solve master model
+        # Step 7.3: Solve master model and age the paths
         m.optimize()
         if m.status == 2:
             val=m.objVal
+        pool.update()
         print("* Iteration {:3.1f}: {:7.3f}       ".format(t,val))
-    
-        # Step 5: Solve initial subproblem using shortest path
-        DijkstraHeap(o, 'pricing', resConstr.pi)
-        reducedCost = nodeSet[d].label - convConstr.pi
         
     print("Paths added")
-    for p in paths:
-        print(paths[p],lamb[p].x)
+    for j in range(pool.size):
+        print(network.linkIds(pool.payloads[j]),pool.value(j))
+    print("Pool:", pool.size, "paths,", len(pool.active()), "in the master,", pool.stats['purged'], "purged,", pool.stats['repriced'], "brought back")
     
     print("Obj val", m.objVal)
+    print("Master solves", t, "pricing calls", pricingCalls, "time", round(time.time() - ts, 3))
         
     
     
@@ -246,17 +217,18 @@ def SPRC_CG(o, d):
 readStart = time.time()
 
 tripSet = {}
-linkSet = {}
-nodeSet = {}
 zoneSet = {}
 
 
 
-readNetwork()
+network = readNetwork()
 assignResources()
+pricer = RCSPPricer(network, 4)
+spQuery = ShortestPathQuery(network)
 
 print("Reading the network data took", round(time.time() - readStart, 2), "secs")
 ###########################################################################################################################
 o, d = ('5', '13')
 gurobiModel(o, d)
 SPRC_CG(o, d)
+SPRC_CG(o, d, 'dijkstra')
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Column generation of SP_CG.py for all the OD pairs of a demand file
+
+The OD pairs are grouped by origin and the origins are spread over a process pool. For one
+origin all its destinations are solved together:
+    - the least resource tree gives the first column of every destination (or shows that the
+      destination cannot be reached within the budget) and the free flow tree a second one,
+    - in every pricing round the destinations with the same dual of the resource constraint are
+      priced by one shortest path tree on fft - dual*resource.
+One JSON line per OD pair (status, objective, iterations, columns, path flows, time) is written
+to the output file as soon as its origin is finished.
+
+    runBatch("Chicago Sketch Network/", "batchCG.jsonl", budget=4, processes=8)
+"""
+import json, time
+import multiprocessing
+import numpy as np
+from gurobipy import *
+from networkGraph import loadNetwork, loadDemand, dijkstra, tracePreds
+
+
+class ODMaster:
+    '''
+    Restricted master problem of one OD pair, its columns are the paths (lists of links)
+    '''
+    def __init__(self, dest, demand, budget):
+        self.dest = dest
+        self.demand = demand
+        self.paths = []
+        self.lamb = []
+        self.iterations = 0
+        self.m = Model(env=env)
+        self.resConstr = self.m.addConstr(LinExpr() <= budget)
+        self.convConstr = self.m.addConstr(LinExpr() == 1)
+
+    def addPath(self, path):
+        c = Column()
+        c.addTerms(network.resource[path].sum(), self.resConstr)
+        c.addTerms(1.0, self.convConstr)
+        self.lamb.append(self.m.addVar(lb = 0.0, obj = network.fft[path].sum(), vtype = GRB.CONTINUOUS, column = c))
+        self.paths.append(path)
+
+    def solve(self):
+        self.iterations += 1
+        self.m.optimize()
+        return self.resConstr.pi, self.convConstr.pi
+
+    def record(self, origin, start):
+        flows = [[[network.nodeIds[network.tail[l]] for l in path[::-1]] + [self.dest], lamb.X]
+                 for path, lamb in zip(self.paths, self.lamb) if lamb.X > 1e-9]
+        rec = {'origin': origin, 'dest': self.dest, 'demand': self.demand, 'status': 'optimal',
+               'obj': self.m.objVal, 'iterations': self.iterations, 'columns': len(self.paths),
+               'flows': flows, 'time': time.time() - start}
+        self.m.dispose()
+        return rec
+
+
+def originTasks(inputLocation, origins=None):
+    '''
+    Returns the destinations and demands of every origin, [(origin, [(dest, demand), ...]), ...]
+    '''
+    network = loadNetwork(inputLocation + "network.dat")
+    demand = loadDemand(inputLocation + "demand.dat", network)
+    if origins is None:
+        origins = demand.origins()
+    else:
+        origins = network.nodesOf([int(o) for o in origins])
+    tasks = []
+    for i in origins:
+        ods = demand.odsOf(i)
+        tasks.append((network.nodeIds[i], list(zip([network.nodeIds[d] for d in demand.dest[ods]], demand.demand[ods].tolist()))))
+    return tasks
+
+
+def initWorker(inputLocation, budget):
+    '''
+    Reads the network in every process, the resources are the ones of SP_CG.assignResources
+    '''
+    global network, env, resourceBudget
+    network = loadNetwork(inputLocation + "network.dat")
+    np.random.seed(15645)
+    network.resource = np.random.randint(8, size=network.numLinks).astype(float)
+    resourceBudget = budget
+    env = Env(empty=True)
+    env.setParam('OutputFlag', 0)
+    env.start()
+
+
+def solveOrigin(task):
+    origin, dests = task
+    start = time.time()
+    o = network.nodeIndex[origin]
+    records = []
+
+    # Step 1: First columns from the least resource and the free flow trees
+    resLabel, resPred = dijkstra(network, o, network.resource)
+    fftLabel, fftPred = dijkstra(network, o, network.fft)
+    active = {}
+    for dest, demand in dests:
+        d = network.nodeIndex[dest]
+        if resLabel[d] > resourceBudget:
+            status = 'unreachable' if np.isinf(resLabel[d]) else 'infeasible'
+            records.append({'origin': origin, 'dest': dest, 'demand': demand, 'status': status,
+                            'obj': None, 'iterations': 0, 'columns': 0, 'flows': [], 'time': time.time() - start})
+            continue
+        master = ODMaster(dest, demand, resourceBudget)
+        master.addPath(tracePreds(network, resPred, d))
+        fftPath = tracePreds(network, fftPred, d)
+        if fftPath != master.paths[0]:
+            master.addPath(fftPath)
+        active[d] = master
+
+    # Step 2: Pricing rounds, one tree for the destinations with the same dual
+    trees = 2
+    duals = {d: active[d].solve() for d in active}
+    while active:
+        groups = {}
+        for d in active:
+            groups.setdefault(round(duals[d][0], 9), []).append(d)
+        for resDual, group in groups.items():
+            label, pred = dijkstra(network, o, network.fft - network.resource*resDual)
+            trees += 1
+            for d in group:
+                master = active[d]
+                if label[d] - duals[d][1] < 0-1e-5:
+                    master.addPath(tracePreds(network, pred, d))
+                    duals[d] = master.solve()
+                else:
+                    records.append(master.record(origin, start))
+                    del active[d]
+    for rec in records:
+        rec['originTrees'] = trees
+    return records
+
+
+def runBatch(inputLocation, outFile, budget=4, processes=None, origins=None):
+    '''
+    Solves the OD pairs of inputLocation/demand.dat (only the origins in the list origins if given)
+    and writes one JSON line per OD pair to outFile. Returns the number of pairs of every status.
+    '''
+    tasks = originTasks(inputLocation, origins)
+    counts = {}
+    out = open(outFile, 'w')
+    if processes == 1:
+        initWorker(inputLocation, budget)
+        results = map(solveOrigin, tasks)
+    else:
+        pool = multiprocessing.Pool(processes, initializer=initWorker, initargs=(inputLocation, budget))
+        results = pool.imap_unordered(solveOrigin, tasks)
+    for records in results:
+        for rec in records:
+            out.write(json.dumps(rec) + '\n')
+            counts[rec['status']] = counts.get(rec['status'], 0) + 1
+        out.flush()
+    out.close()
+    if processes != 1:
+        pool.close()
+        pool.join()
+    return counts
+
+
+###########################################################################################################################
+if __name__ == '__main__':
+    ts = time.time()
+    counts = runBatch("Sioux Falls network/", "batchCG.jsonl", budget=4)
+    print(counts)
+    print("Batch column generation took", round(time.time() - ts, 2), "secs")
@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+"""
+Array based representation of a transportation network
+
+The nodes get integer indices 0..numNodes-1 (in the order in which they appear in network.dat)
+and the links are stored as NumPy arrays (tail, head, capacity, length, fft, ...) with a CSR
+forward star (outStart, outLinks) and backward star (inStart, inLinks):
+
+    links leaving node i:   outLinks[outStart[i]:outStart[i+1]]
+    links entering node i:  inLinks[inStart[i]:inStart[i+1]]
+
+    network = loadNetwork("Sioux Falls network/network.dat")
+    label, pred = dijkstra(network, network.nodeIndex['5'], network.fft)
+    path = tracePreds(network, pred, network.nodeIndex['13'])
+
+The text files are parsed in chunks straight into NumPy arrays and the arrays are cached as .npy
+files in .cache/ next to the data, so the next runs memory map them instead of parsing. A cache
+is used while the size and the modification time of its source file are the same (or, if the
+file was only touched, its SHA-1). The dictionaries nodeIndex, linkIndex and odIndex are built
+on first access.
+
+    demand = loadDemand("Sioux Falls network/demand.dat", network)
+    k = demand.odIndex['5', '13']; demand.demand[k]
+
+The same file is used by the column generation and the network design scripts.
+"""
+import hashlib, heapq, json, os
+import numpy as np
+import scipy.sparse as sparse
+
+
+class Network:
+    '''
+    Nodes, links and the forward and backward stars of a network
+    '''
+    def __init__(self, nodeIds, tail, head, linkData):
+        # nodeIdArray holds the integer ids of the files, nodeIds the same ids as strings
+        self.nodeIdArray = np.asarray(nodeIds, dtype=np.int64)
+        self.nodeIds = [str(n) for n in self.nodeIdArray.tolist()]
+        self.numNodes = len(self.nodeIds)
+        self.numLinks = len(tail)
+        self.tail = np.asarray(tail, dtype=np.int32)
+        self.head = np.asarray(head, dtype=np.int32)
+        linkData = np.asarray(linkData, dtype=float).reshape(self.numLinks, -1)
+        self.capacity = linkData[:, 0].copy() # veh per hour
+        self.length = linkData[:, 1].copy()
+        self.fft = linkData[:, 2].copy() # Free flow travel time (min)
+        self.alpha = linkData[:, 3].copy()
+        self.beta = linkData[:, 4].copy()
+        self.speedLimit = linkData[:, 5].copy()
+        self.resource = np.zeros(self.numLinks)
+        self.outStart, self.outLinks = self.star(self.tail)
+        self.inStart, self.inLinks = self.star(self.head)
+        self._nodeIndex = None
+        self._linkIndex = None
+
+    @property
+    def nodeIndex(self):
+        if self._nodeIndex is None:
+            self._nodeIndex = {n: i for i, n in enumerate(self.nodeIds)}
+        return self._nodeIndex
+
+    @property
+    def linkIndex(self):
+        if self._linkIndex is None:
+            self._linkIndex = {(t, h): l for l, (t, h) in enumerate(zip(self.tail.tolist(), self.head.tolist()))}
+        return self._linkIndex
+
+    def nodesOf(self, ids):
+        '''
+        Node indices of the array of integer node ids
+        '''
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(self.nodeIdArray)
+        pos = np.minimum(np.searchsorted(self.nodeIdArray, ids, sorter=order), self.numNodes - 1)
+        nodes = order[pos]
+        if len(ids) and np.any(self.nodeIdArray[nodes] != ids):
+            raise ValueError("Node {} is not in the network".format(ids[self.nodeIdArray[nodes] != ids][0]))
+        return nodes.astype(np.int32)
+
+    def star(self, nodes):
+        # Links sorted by node, the input order is kept for the links of the same node
+        order = np.argsort(nodes, kind='stable').astype(np.int32)
+        start = np.zeros(self.numNodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(nodes, minlength=self.numNodes), out=start[1:])
+        return start, order
+
+    def outLinksOf(self, i):
+        return self.outLinks[self.outStart[i]:self.outStart[i + 1]]
+
+    def inLinksOf(self, i):
+        return self.inLinks[self.inStart[i]:self.inStart[i + 1]]
+
+    def link(self, tailId, headId):
+        '''
+        Index of the link between the nodes with ids tailId and headId
+        '''
+        return self.linkIndex[self.nodeIndex[tailId], self.nodeIndex[headId]]
+
+    def incidence(self):
+        '''
+        numNodes x numLinks node-link incidence matrix, +1 at the tail and -1 at the head of every link
+        '''
+        links = np.arange(self.numLinks)
+        return sparse.csr_matrix((np.concatenate([np.ones(self.numLinks), -np.ones(self.numLinks)]),
+                                  (np.concatenate([self.tail, self.head]), np.concatenate([links, links]))),
+                                 shape=(self.numNodes, self.numLinks))
+
+    def linkIds(self, links):
+        '''
+        (tail id, head id) of the links
+        '''
+        return [(self.nodeIds[self.tail[l]], self.nodeIds[self.head[l]]) for l in links]
+
+
+class Demand:
+    '''
+    OD pairs as arrays of node indices (origin, dest) and demands, grouped by origin on request
+    '''
+    def __init__(self, network, origin, dest, demand):
+        self.network = network
+        self.origin = np.asarray(origin, dtype=np.int32)
+        self.dest = np.asarray(dest, dtype=np.int32)
+        self.demand = np.asarray(demand, dtype=float)
+        self.numODs = len(self.demand)
+        self._odIndex = None
+        self._originStart = None
+
+    @property
+    def odIndex(self):
+        '''
+        {(origin id, dest id): k}, the first row of a pair that appears twice
+        '''
+        if self._odIndex is None:
+            ids = self.network.nodeIds
+            self._odIndex = {}
+            for k, (o, d) in enumerate(zip(self.origin.tolist(), self.dest.tolist())):
+                self._odIndex.setdefault((ids[o], ids[d]), k)
+        return self._odIndex
+
+    def odsOf(self, i):
+        '''
+        Rows of the OD pairs with the origin node index i
+        '''
+        if self._originStart is None:
+            self._originStart, self._originODs = self.network.star(self.origin)
+        return self._originODs[self._originStart[i]:self._originStart[i + 1]]
+
+    def origins(self):
+        return np.unique(self.origin)
+
+
+def fileHash(fileName):
+    sha = hashlib.sha1()
+    with open(fileName, 'rb') as inFile:
+        for block in iter(lambda: inFile.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def cachedArrays(fileName, parse, cache=True):
+    '''
+    Returns the dictionary of arrays parse(fileName). With cache=True the arrays are saved in
+    .cache/<file name>/ next to the file and memory mapped (read only) on the next calls.
+    '''
+    if not cache:
+        return parse(fileName)
+    cacheDir = os.path.join(os.path.dirname(fileName), '.cache', os.path.basename(fileName))
+    metaFile = os.path.join(cacheDir, 'meta.json')
+    info = os.stat(fileName)
+    if os.path.exists(metaFile):
+        with open(metaFile) as inFile:
+            meta = json.load(inFile)
+        valid = meta['size'] == info.st_size and meta['mtime'] == info.st_mtime_ns
+        if not valid and meta['size'] == info.st_size and meta['sha1'] == fileHash(fileName):
+            # Only touched, keep the cache with the new time
+            meta['mtime'] = info.st_mtime_ns
+            with open(metaFile, 'w') as out:
+                json.dump(meta, out)
+            valid = True
+        if valid:
+            return {name: np.load(os.path.join(cacheDir, name + '.npy'), mmap_mode='r') for name in meta['arrays']}
+
+    arrays = parse(fileName)
+    os.makedirs(cacheDir, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(cacheDir, name + '.npy'), array)
+    # The meta data is written last, a cache without it is parsed again
+    with open(metaFile, 'w') as out:
+        json.dump({'size': info.st_size, 'mtime': info.st_mtime_ns, 'sha1': fileHash(fileName),
+                   'arrays': list(arrays)}, out)
+    return arrays
+
+
+def readColumns(fileName, columns, chunkBytes=1 << 22):
+    '''
+    The columns (indices) of a tab separated file with a header line as a float array, the lines
+    with fewer fields than the last column are skipped. The file is parsed chunkBytes at a time.
+    '''
+    chunks = []
+    inFile = open(fileName)
+    inFile.readline()
+    while True:
+        lines = inFile.readlines(chunkBytes)
+        if not lines:
+            break
+        lines = [x for x in lines if x.strip().count("\t") >= max(columns)]
+        if lines:
+            chunks.append(np.loadtxt(lines, delimiter="\t", usecols=columns, ndmin=2))
+    inFile.close()
+    return np.concatenate(chunks) if chunks else np.zeros((0, len(columns)))
+
+
+def parseNetwork(fileName):
+    # Nodes in the order in which they appear, links in the order of their first line
+    table = readColumns(fileName, list(range(8)))
+    ends = table[:, :2].astype(np.int64)
+    ids, first = np.unique(ends.ravel(), return_index=True)
+    nodeOf = np.empty(len(ids), dtype=np.int64)
+    nodeOf[np.argsort(first)] = np.arange(len(ids))
+    ends = nodeOf[np.searchsorted(ids, ends)]
+    key = ends[:, 0]*len(ids) + ends[:, 1]
+    firstLine = np.unique(key, return_index=True)[1]
+    lastLine = len(key) - 1 - np.unique(key[::-1], return_index=True)[1]
+    order = np.argsort(firstLine)
+    return {'nodeIds': ids[np.argsort(first)], 'tail': ends[firstLine[order], 0], 'head': ends[firstLine[order], 1],
+            'linkData': table[lastLine[order], 2:8]}
+
+
+def loadNetwork(fileName, cache=True):
+    '''
+    Reads a tab separated network.dat (tail, head, capacity, length, fft, alpha, beta, speedLimit, ...)
+    A link that appears twice keeps its first position and the data of its last line.
+    '''
+    arrays = cachedArrays(fileName, parseNetwork, cache)
+    return Network(arrays['nodeIds'], arrays['tail'], arrays['head'], arrays['linkData'])
+
+
+def parseDemand(fileName):
+    table = readColumns(fileName, [0, 1, 2])
+    return {'origin': table[:, 0].astype(np.int64), 'dest': table[:, 1].astype(np.int64), 'demand': table[:, 2]}
+
+
+def loadDemand(fileName, network, cache=True):
+    '''
+    Reads a tab separated demand.dat (origin, dest, demand), the pairs with origin = dest are dropped
+    '''
+    arrays = cachedArrays(fileName, parseDemand, cache)
+    keep = arrays['origin'] != arrays['dest']
+    return Demand(network, network.nodesOf(arrays['origin'][keep]), network.nodesOf(arrays['dest'][keep]),
+                  arrays['demand'][keep])
+
+
+def dijkstra(network, origin, cost, reverse=False):
+    '''
+    Shortest paths from the node index origin with the link costs in the array cost.
+    Returns the labels and the predecessor link of every node (-1 for the origin and unreached nodes).
+    With reverse=True the links are followed backwards, i.e. the labels are the shortest paths
+    from every node to origin and pred is the successor link.
+    '''
+    if reverse:
+        outStart = network.inStart.tolist()
+        outLinks = network.inLinks.tolist()
+        head = network.tail.tolist()
+    else:
+        outStart = network.outStart.tolist()
+        outLinks = network.outLinks.tolist()
+        head = network.head.tolist()
+    cost = np.asarray(cost, dtype=float).tolist()
+    label = [float("inf")]*network.numNodes
+    pred = [-1]*network.numNodes
+    label[origin] = 0.0
+    SE = [(0.0, origin)]
+    while SE:
+        currentLabel, currentNode = heapq.heappop(SE)
+        if currentLabel > label[currentNode]:
+            continue
+        for l in outLinks[outStart[currentNode]:outStart[currentNode + 1]]:
+            newLabel = currentLabel + cost[l]
+            newNode = head[l]
+            if newLabel < label[newNode]:
+                label[newNode] = newLabel
+                pred[newNode] = l
+                heapq.heappush(SE, (newLabel, newNode))
+    return np.array(label), np.array(pred, dtype=np.int64)
+
+
+def tracePreds(network, pred, dest):
+    '''
+    Links of the shortest path to the node index dest, from dest back to the origin
+    '''
+    spLinks = []
+    while pred[dest] != -1:
+        spLinks.append(int(pred[dest]))
+        dest = network.tail[pred[dest]]
+    return spLinks
+
+
+class ShortestPathQuery:
+    '''
+    One-to-one shortest path queries that stop when the destination is settled
+
+        query = ShortestPathQuery(network)
+        dist, links = query.path(origin, dest, cost, mode='astar')
+
+    mode is 'dijkstra', 'bidirectional' or 'astar'. The A* potential is the free flow time to
+    the destination, a lower bound as long as cost >= network.fft (true for the pricing costs
+    fft - pi*resource with pi <= 0), it is computed once per destination. The labels are kept
+    between the queries and reset lazily: a label is valid only if the stamp of its node is the
+    stamp of the current query, so a query only touches the nodes it reaches.
+    '''
+    def __init__(self, network):
+        self.network = network
+        self.outStart, self.outLinks = network.outStart.tolist(), network.outLinks.tolist()
+        self.inStart, self.inLinks = network.inStart.tolist(), network.inLinks.tolist()
+        self.tail, self.head = network.tail.tolist(), network.head.tolist()
+        # Index 0 is the forward search, 1 the backward one
+        self.label = [[0.0]*network.numNodes, [0.0]*network.numNodes]
+        self.pred = [[-1]*network.numNodes, [-1]*network.numNodes]
+        self.stamp = [[0]*network.numNodes, [0]*network.numNodes]
+        self.settled = [[0]*network.numNodes, [0]*network.numNodes]
+        self.current = 0
+        self.potentials = {}
+        self.stats = {'queries': 0, 'settled': 0}
+
+    def freeFlowPotential(self, dest):
+        if dest not in self.potentials:
+            self.potentials[dest] = dijkstra(self.network, dest, self.network.fft, reverse=True)[0].tolist()
+        return self.potentials[dest]
+
+    def path(self, origin, dest, cost, mode='dijkstra'):
+        '''
+        Returns the length of the shortest path from origin to dest (node indices) and its links
+        from dest back to origin as tracePreds, (inf, []) if dest cannot be reached
+        '''
+        cost = np.asarray(cost, dtype=float).tolist()
+        self.current += 1
+        self.stats['queries'] += 1
+        if origin == dest:
+            return 0.0, []
+        if mode == 'dijkstra':
+            return self.search(origin, dest, cost, None)
+        elif mode == 'astar':
+            return self.search(origin, dest, cost, self.freeFlowPotential(dest))
+        elif mode == 'bidirectional':
+            return self.bidirectional(origin, dest, cost)
+        else:
+            raise ValueError("Shortest path mode ({:s}) is not recognized".format(mode))
+
+    def search(self, origin, dest, cost, potential):
+        label, pred, stamp, settled = self.label[0], self.pred[0], self.stamp[0], self.settled[0]
+        outStart, outLinks, head = self.outStart, self.outLinks, self.head
+        current = self.current
+        label[origin] = 0.0; pred[origin] = -1; stamp[origin] = current
+        SE = [(0.0, origin)]
+        while SE:
+            currentKey, currentNode = heapq.heappop(SE)
+            if settled[currentNode] == current:
+                continue
+            settled[currentNode] = current
+            self.stats['settled'] += 1
+            if currentNode == dest:
+                return label[dest], self.links(dest, 0)
+            currentLabel = label[currentNode]
+            for l in outLinks[outStart[currentNode]:outStart[currentNode + 1]]:
+                newLabel = currentLabel + cost[l]
+                newNode = head[l]
+                if stamp[newNode] != current or newLabel < label[newNode]:
+                    label[newNode] = newLabel
+                    pred[newNode] = l
+                    stamp[newNode] = current
+                    heapq.heappush(SE, (newLabel if potential is None else newLabel + potential[newNode], newNode))
+        return float("inf"), []
+
+    def bidirectional(self, origin, dest, cost):
+        stars = [(self.outStart, self.outLinks, self.head), (self.inStart, self.inLinks, self.tail)]
+        current = self.current
+        SE = [[(0.0, origin)], [(0.0, dest)]]
+        for side, node in ((0, origin), (1, dest)):
+            self.label[side][node] = 0.0; self.pred[side][node] = -1; self.stamp[side][node] = current
+        best, meet = float("inf"), -1
+        # Stop when the two smallest keys add up to the best path joining the searches
+        while SE[0] and SE[1] and SE[0][0][0] + SE[1][0][0] < best:
+            side = 0 if len(SE[0]) <= len(SE[1]) else 1
+            label, pred, stamp, settled = self.label[side], self.pred[side], self.stamp[side], self.settled[side]
+            otherLabel, otherStamp = self.label[1 - side], self.stamp[1 - side]
+            starts, links, heads = stars[side]
+            currentLabel, currentNode = heapq.heappop(SE[side])
+            if settled[currentNode] == current:
+                continue
+            settled[currentNode] = current
+            self.stats['settled'] += 1
+            for l in links[starts[currentNode]:starts[currentNode + 1]]:
+                newLabel = currentLabel + cost[l]
+                newNode = heads[l]
+                if stamp[newNode] != current or newLabel < label[newNode]:
+                    label[newNode] = newLabel
+                    pred[newNode] = l
+                    stamp[newNode] = current
+                    heapq.heappush(SE[side], (newLabel, newNode))
+                    if otherStamp[newNode] == current and newLabel + otherLabel[newNode] < best:
+                        best, meet = newLabel + otherLabel[newNode], newNode
+        if meet == -1:
+            return float("inf"), []
+        return best, self.links(meet, 1)[::-1] + self.links(meet, 0)
+
+    def links(self, node, side):
+        # Links from node back to the start of the search of side
+        pred, ends = self.pred[side], (self.tail, self.head)[side]
+        spLinks = []
+        while pred[node] != -1:
+            spLinks.append(pred[node])
+            node = ends[pred[node]]
+        return spLinks
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Label setting algorithm for the resource constrained shortest path problem
+
+    min  \sum_{l \in P} cost_l   s.t.  \sum_{l \in P} resource_l <= budget,  P path from o to d
+
+It is the exact pricing problem of the column generation in SP_CG.py (cost_l = fft_l - pi*resource_l
+with pi <= 0 the dual of the resource constraint), so the link costs and resources must be non-negative.
+
+A label is (cost, resource, node, link, parent). The labels are extended in increasing order of
+cost, so a label is dominated at its node iff an earlier label of that node used at most the same
+resource, i.e. only the smallest resource seen at every node has to be kept. Labels are also
+dropped when
+    - resource + (least resource from the node to d) > budget, or
+    - cost + (least cost from the node to d) >= threshold (the path cannot have a negative reduced cost).
+
+With bidirectional=True the labels are extended forward from o and backward from d, each with half
+of the budget, and joined over the links. The cheapest path is the same, the other paths returned
+can differ from the ones of the one directional search.
+
+    pricer = RCSPPricer(network, 4)
+    paths = pricer.price(o, d, cost, threshold, k=5)
+
+Every path is (cost, resource, links) with the links from d back to o, as tracePreds.
+"""
+import bisect, heapq
+import numpy as np
+from networkGraph import dijkstra
+
+
+class RCSPPricer:
+    def __init__(self, network, budget):
+        self.network = network
+        self.budget = budget
+        self.resource = np.asarray(network.resource, dtype=float)
+        # Least resource to (from) every node, they do not depend on the duals
+        self.resourceTo = {}
+        self.resourceFrom = {}
+        self.stats = {'calls': 0, 'labels': 0, 'paths': 0}
+
+    def leastResource(self, node, reverse):
+        bounds = self.resourceTo if reverse else self.resourceFrom
+        if node not in bounds:
+            bounds[node] = dijkstra(self.network, node, self.resource, reverse)[0].tolist()
+        return bounds[node]
+
+    def labelSetting(self, start, cost, limit, costBound, resourceBound, threshold, reverse, stopNode=-1, k=1):
+        '''
+        Extends labels from start (backwards if reverse) while their resource is at most limit.
+        Returns the labels and the non-dominated labels of every node in increasing order of cost.
+        If stopNode is given the search stops when k labels of stopNode with cost < threshold are found.
+        '''
+        net = self.network
+        if reverse:
+            starts, links, heads = net.inStart.tolist(), net.inLinks.tolist(), net.tail.tolist()
+        else:
+            starts, links, heads = net.outStart.tolist(), net.outLinks.tolist(), net.head.tolist()
+        resource = self.resource.tolist()
+        budget = self.budget
+        labels = [(0.0, 0.0, start, -1, -1)]
+        minRes = [float("inf")]*net.numNodes
+        front = [[] for i in range(net.numNodes)]
+        SE = [(0.0, 0.0, 0)]
+        while SE:
+            currentCost, currentRes, idx = heapq.heappop(SE)
+            node = labels[idx][2]
+            if currentRes >= minRes[node]:
+                continue
+            minRes[node] = currentRes
+            front[node].append(idx)
+            if node == stopNode:
+                if len(front[node]) >= k:
+                    break
+                continue
+            for l in links[starts[node]:starts[node + 1]]:
+                newNode = heads[l]
+                newRes = currentRes + resource[l]
+                if newRes > limit or newRes >= minRes[newNode] or newRes + resourceBound[newNode] > budget:
+                    continue
+                newCost = currentCost + cost[l]
+                if newCost + costBound[newNode] >= threshold:
+                    continue
+                labels.append((newCost, newRes, newNode, l, idx))
+                heapq.heappush(SE, (newCost, newRes, len(labels) - 1))
+        self.stats['labels'] += len(labels)
+        return labels, front
+
+    def chain(self, labels, idx):
+        # Links from the node of the label back to the start of the search
+        links = []
+        while labels[idx][3] != -1:
+            links.append(labels[idx][3])
+            idx = labels[idx][4]
+        return links
+
+    def price(self, origin, dest, cost, threshold=0.0, k=1, bidirectional=False):
+        '''
+        Returns up to k resource feasible paths from origin to dest (node indices) with cost < threshold,
+        cheapest first
+        '''
+        cost = np.asarray(cost, dtype=float)
+        if len(cost) and cost.min() < -1e-9:
+            raise ValueError("Label setting needs non-negative link costs")
+        cost = np.maximum(cost, 0).tolist()
+        self.stats['calls'] += 1
+        costTo = dijkstra(self.network, dest, cost, reverse=True)[0].tolist()
+        resourceTo = self.leastResource(dest, True)
+        if costTo[origin] >= threshold or resourceTo[origin] > self.budget:
+            return []
+
+        if not bidirectional:
+            labels, front = self.labelSetting(origin, cost, self.budget, costTo, resourceTo, threshold, False, dest, k)
+            paths = [(labels[idx][0], labels[idx][1], self.chain(labels, idx)) for idx in front[dest]]
+        else:
+            paths = self.bidirectionalPrice(origin, dest, cost, threshold, k, costTo, resourceTo)
+        paths = [path for path in paths if path[0] < threshold][:k]
+        self.stats['paths'] += len(paths)
+        return paths
+
+    def bidirectionalPrice(self, origin, dest, cost, threshold, k, costTo, resourceTo):
+        half = self.budget/2
+        costFrom = dijkstra(self.network, origin, cost)[0].tolist()
+        resourceFrom = self.leastResource(origin, False)
+        fLabels, fFront = self.labelSetting(origin, cost, half, costTo, resourceTo, threshold, False)
+        bLabels, bFront = self.labelSetting(dest, cost, self.budget - half, costFrom, resourceFrom, threshold, True)
+
+        # Paths that never use more than half of the budget are complete forward labels
+        candidates = [(fLabels[idx][0], fLabels[idx][1], idx, -1, -1) for idx in fFront[dest]]
+        # The other ones are joined on the link where the forward resource goes over half of the budget
+        tail, head = self.network.tail.tolist(), self.network.head.tolist()
+        resource = self.resource.tolist()
+        for l in range(self.network.numLinks):
+            forward, backward = fFront[tail[l]], bFront[head[l]]
+            if not forward or not backward:
+                continue
+            # Resources of the backward labels are decreasing, their costs increasing
+            negRes = [-bLabels[b][1] for b in backward]
+            for a in forward:
+                aCost, aRes = fLabels[a][0] + cost[l], fLabels[a][1] + resource[l]
+                if aRes <= half:
+                    continue
+                first = bisect.bisect_left(negRes, -(self.budget - aRes))
+                for b in backward[first:first + k]:
+                    pathCost = aCost + bLabels[b][0]
+                    if pathCost >= threshold:
+                        break
+                    candidates.append((pathCost, aRes + bLabels[b][1], a, l, b))
+
+        # Same dominance at dest as the label setting, this also drops the joined paths with cycles
+        candidates.sort()
+        paths = []
+        minRes = float("inf")
+        for (pathCost, pathRes, a, l, b) in candidates:
+            if pathRes >= minRes:
+                continue
+            minRes = pathRes
+            links = self.chain(fLabels, a)
+            if l != -1:
+                links = self.chain(bLabels, b)[::-1] + [l] + links
+            paths.append((pathCost, pathRes, links))
+            if len(paths) == k:
+                break
+        return paths
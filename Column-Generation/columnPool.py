@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Pool of the columns of a column generation master (a Gurobi model)
+
+The coefficients of every column in the master rows and its cost are kept in preallocated
+arrays that double when they are full, so adding a column does not copy the pool. A column is
+either active (a variable of the master) or inactive (only in the pool):
+    - add() skips the columns already in the pool (same key) and activates them if inactive,
+    - reprice() activates the inactive columns with a negative reduced cost for the duals,
+      before a new pricing problem is solved,
+    - update() ages the active columns after a master solve; a column with a positive reduced
+      cost for more than maxAge solves is removed from the master (but kept in the pool).
+
+    pool = ColumnPool(m, constrs, maxAge=20)
+    j, added = pool.add(coeffs, cost, key, payload)
+    m.optimize(); pool.update()
+
+It is shared by the cutting stock and the shortest path column generation, which load it from
+this folder.
+"""
+import numpy as np
+from gurobipy import *
+
+
+class ColumnPool:
+    def __init__(self, m, constrs, maxAge=20, capacity=64, tol=1e-6):
+        self.m = m
+        self.constrs = list(constrs)
+        self.maxAge = maxAge
+        self.tol = tol
+        self.coeffs = np.zeros((capacity, len(self.constrs)))
+        self.cost = np.zeros(capacity)
+        self.age = np.zeros(capacity, dtype=int)
+        self.size = 0
+        self.vars = []
+        self.keys = {}
+        self.payloads = []
+        self.stats = {'added': 0, 'duplicates': 0, 'repriced': 0, 'purged': 0}
+
+    def grow(self):
+        capacity = 2*len(self.cost)
+        coeffs = np.zeros((capacity, len(self.constrs))); coeffs[:self.size] = self.coeffs[:self.size]
+        cost = np.zeros(capacity); cost[:self.size] = self.cost[:self.size]
+        age = np.zeros(capacity, dtype=int); age[:self.size] = self.age[:self.size]
+        self.coeffs, self.cost, self.age = coeffs, cost, age
+
+    def add(self, coeffs, cost, key=None, payload=None, var=None):
+        '''
+        Adds a column to the pool and to the master (or uses var if it is already in the master).
+        Returns its index and whether it was added to the master.
+        '''
+        coeffs = np.asarray(coeffs, dtype=float)
+        if key is None:
+            key = coeffs.tobytes() + np.float64(cost).tobytes()
+        if key in self.keys:
+            j = self.keys[key]
+            self.stats['duplicates'] += 1
+            return j, self.activate(j)
+        if self.size == len(self.cost):
+            self.grow()
+        j = self.size
+        self.coeffs[j] = coeffs
+        self.cost[j] = cost
+        self.age[j] = 0
+        self.keys[key] = j
+        self.vars.append(var)
+        self.payloads.append(payload)
+        self.size += 1
+        self.stats['added'] += 1
+        return j, self.activate(j)
+
+    def activate(self, j):
+        if self.vars[j] is not None:
+            return False
+        rows = np.nonzero(self.coeffs[j])[0]
+        self.vars[j] = self.m.addVar(lb = 0.0, obj = self.cost[j], vtype = GRB.CONTINUOUS,
+                                     column = Column(self.coeffs[j, rows].tolist(), [self.constrs[i] for i in rows]))
+        self.age[j] = 0
+        return True
+
+    def reducedCosts(self, duals):
+        return self.cost[:self.size] - self.coeffs[:self.size] @ np.asarray(duals, dtype=float)
+
+    def reprice(self, duals):
+        '''
+        Activates the inactive columns with a negative reduced cost, returns how many
+        '''
+        inactive = np.array([v is None for v in self.vars], dtype=bool)
+        candidates = np.nonzero(inactive & (self.reducedCosts(duals) < -self.tol))[0]
+        for j in candidates:
+            self.activate(j)
+        self.stats['repriced'] += len(candidates)
+        return len(candidates)
+
+    def update(self):
+        '''
+        Ages the active columns after a master solve and removes the old non basic ones
+        '''
+        active = [j for j in range(self.size) if self.vars[j] is not None]
+        if not active or self.m.status != GRB.OPTIMAL:
+            return 0
+        activeVars = [self.vars[j] for j in active]
+        # Degenerate columns (reduced cost zero) are kept, they would come back at the next duals
+        used = ((np.array(self.m.getAttr('VBasis', activeVars)) == 0) | (np.array(self.m.getAttr('X', activeVars)) > self.tol)
+                | (np.array(self.m.getAttr('RC', activeVars)) <= self.tol))
+        active = np.array(active)
+        self.age[active[used]] = 0
+        self.age[active[~used]] += 1
+        purged = active[self.age[active] > self.maxAge]
+        for j in purged:
+            self.m.remove(self.vars[j])
+            self.vars[j] = None
+        self.stats['purged'] += len(purged)
+        return len(purged)
+
+    def active(self):
+        return [j for j in range(self.size) if self.vars[j] is not None]
+
+    def value(self, j):
+        return self.vars[j].X if self.vars[j] is not None else 0.0
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Wentges smoothing of the duals of a column generation master
+
+The pricing is done at alpha*center + (1-alpha)*duals, where center are the duals of the best
+Lagrangian bound found so far. When no column found there has a negative reduced cost at the
+master duals (mis-pricing) alpha is decreased and the pricing is repeated, every retry closer to
+the duals and with alpha = 0 it is the pricing at the duals. It also stops when the bound meets
+the master value val.
+
+    columns, LB, center, calls, misprices = stabilizedPricing(price, bound, evaluate, val, duals, center, alpha)
+
+price(sep) solves the pricing problem at the separation point sep, bound(sep, result) is the
+Lagrangian bound of sep from that result and evaluate(result) returns the columns at the master
+duals and whether one of them improves. The same loop is used by the cutting stock and the
+shortest path column generation.
+"""
+
+
+def stabilizedPricing(price, bound, evaluate, val, duals, center, alpha):
+    '''
+    Returns the columns of the last pricing (see evaluate), the best bound and its duals, the
+    pricing calls and the mis-pricings
+    '''
+    if not 0 <= alpha < 1:
+        raise ValueError("The smoothing parameter alpha must be in [0, 1)")
+    bestLB, bestDuals = -float("inf"), duals
+    alphaK = alpha; misprices = 0
+    while True:
+        sep = alphaK*center + (1 - alphaK)*duals
+        result = price(sep)
+        LB = bound(sep, result)
+        if LB > bestLB:
+            bestLB, bestDuals = LB, sep
+        columns, improving = evaluate(result)
+        if improving or alphaK == 0 or val - bestLB <= 1e-6*max(1, abs(val)):
+            return columns, bestLB, bestDuals, misprices + 1, misprices
+        misprices += 1
+        # The k-th retry prices at alpha_k = 1 - (k+1)(1-alpha), never at a point priced before
+        alphaK = max(0.0, 1 - (misprices + 1)*(1 - alpha))
@@ -0,0 +1,24 @@
+from stabilization import stabilizedPricing
+
+
+def test_no_separation_point_is_priced_twice():
+    for alpha in [0.3, 0.5, 0.8, 0.95]:
+        seps = []
+
+        def price(sep):
+            seps.append(sep)
+            return sep
+
+        # Only the pricing at the master duals (1.0) finds an improving column
+        columns, LB, center, calls, misprices = stabilizedPricing(price, lambda sep, result: -float("inf"),
+                                                                  lambda result: ([result], result == 1.0),
+                                                                  0.0, 1.0, 0.0, alpha)
+        assert len(set(seps)) == len(seps)
+        assert seps[-1] == 1.0
+        assert calls == len(seps) and misprices == len(seps) - 1
+
+
+def test_stops_at_the_first_improving_pricing():
+    calls = stabilizedPricing(lambda sep: sep, lambda sep, result: -float("inf"), lambda result: ([result], True),
+                              0.0, 1.0, 0.0, 0.5)[3]
+    assert calls == 1
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Benders decomposition of the uncapacitated fixed charge network design problem
+
+    min  \sum_l f_l y_l + \sum_k d_k \sum_l c_l x_lk
+    s.t. x_.k is a unit flow from the origin to the destination of the OD pair k,
+         x_lk <= y_l,  y_l binary
+
+The master only has the binary link variables y and one variable theta per origin (or per OD pair
+with aggregate='commodity') for the routing cost, so its size grows with the links and not with the
+links times the OD pairs. For a design y the subproblem of an origin is one shortest path tree on the
+open links. With the labels pi of the tree (cut at pi_d for the destination d), every link gets the
+dual mu_l = max(0, min(pi_j, pi_d) - min(pi_i, pi_d) - c_l) and
+
+    theta_o >= \sum_{k from o} d_k (pi_dk - \sum_l mu_lk y_l)
+
+is a Benders cut, tight at y (mu_l > 0 only for the closed links). A destination that cannot be
+reached gives the cut \sum_{l leaving the reached nodes} y_l >= 1. The cuts are added as lazy
+constraints of one branch and bound (Gurobi callback at every integer solution).
+
+    obj, bound, openLinks, stats = solveDesignBenders(network, demand, fixedCost, flowCost)
+"""
+import time
+import numpy as np
+from gurobipy import *
+from networkGraph import dijkstra
+
+
+def originCuts(network, demand, origin, ods, flowCost, y):
+    '''
+    Benders cuts of the OD pairs ods (all from origin) at the design y (0/1 per link)
+    Returns the labels of the tree, which OD pairs are reached, and for the reached ones the
+    constants and the link coefficients of the cuts (one row per OD pair):
+        theta_k >= const_k - coeffs_k @ y
+    '''
+    label, pred = dijkstra(network, origin, np.where(y > 0.5, flowCost, np.inf))
+    P = label[demand.dest[ods]]
+    reached = np.isfinite(P)
+    P = P[reached]
+    dem = demand.demand[ods][reached]
+    tailLabel = np.minimum(label[network.tail][None, :], P[:, None])
+    headLabel = np.minimum(label[network.head][None, :], P[:, None])
+    coeffs = np.maximum(0.0, headLabel - tailLabel - flowCost[None, :])*dem[:, None]
+    return label, reached, P*dem, coeffs
+
+
+def solveDesignBenders(network, demand, fixedCost, flowCost, aggregate='origin', timeLimit=None, verbose=0, tol=1e-6):
+    '''
+    aggregate='origin' has one routing cost variable and one cut per origin, 'commodity' per OD
+    pair (stronger master, but as many variables as OD pairs). The OD pairs that cannot be routed
+    with every link open are left out. Returns the objective, the bound, the open links and a
+    dictionary of statistics.
+    '''
+    ts = time.time()
+    fixedCost = np.asarray(fixedCost, dtype=float)
+    flowCost = np.asarray(flowCost, dtype=float)
+    stats = {'lazyRounds': 0, 'optimalityCuts': 0, 'feasibilityCuts': 0, 'subproblemTime': 0.0}
+
+    # Step 1: OD pairs of every origin that can be routed with every link open
+    groups = {}
+    for o in demand.origins():
+        ods = demand.odsOf(o)
+        label, pred = dijkstra(network, o, flowCost)
+        routed = np.isfinite(label[demand.dest[ods]])
+        if not routed.all():
+            print("Origin", network.nodeIds[o], "cannot reach", int((~routed).sum()), "destinations, they are left out")
+        if routed.any():
+            groups[o] = ods[routed]
+
+    # Step 2: Master problem with the link variables and the routing costs
+    m = Model()
+    y = [m.addVar(obj = fixedCost[l], vtype = GRB.BINARY, name = "y" + str(l)) for l in range(network.numLinks)]
+    if aggregate == 'origin':
+        theta = {o: [m.addVar(lb = 0.0, obj = 1.0, name = "theta" + str(o))]*len(groups[o]) for o in groups}
+    elif aggregate == 'commodity':
+        theta = {o: [m.addVar(lb = 0.0, obj = 1.0, name = "theta" + str(k)) for k in groups[o]] for o in groups}
+    else:
+        raise ValueError("Aggregation ({:s}) is not recognized".format(aggregate))
+    m.update()
+
+    def cuts(yVal):
+        '''
+        Cuts at the design yVal, a list of (kind, variables, coefficients, rhs) of
+        \sum coefficients*variables >= rhs
+        '''
+        start = time.time()
+        found = []
+        for o, ods in groups.items():
+            label, reached, const, coeffs = originCuts(network, demand, o, ods, flowCost, yVal)
+            if not reached.all():
+                leaving = np.nonzero(np.isfinite(label[network.tail]) & ~np.isfinite(label[network.head]))[0]
+                found.append(('feasibilityCuts', [y[l] for l in leaving], [1.0]*len(leaving), 1.0))
+            thetas = [v for v, r in zip(theta[o], reached) if r]
+            if aggregate == 'origin' and thetas:
+                const, coeffs, thetas = [const.sum()], [coeffs.sum(axis=0)], thetas[:1]
+            for v, c, row in zip(thetas, const, coeffs):
+                links = np.nonzero(row > 0)[0]
+                found.append(('optimalityCuts', [v] + [y[l] for l in links], [1.0] + row[links].tolist(), c))
+        stats['subproblemTime'] += time.time() - start
+        return found
+
+    # Step 3: First cuts from the design with every link open, which is also the first solution
+    for (kind, variables, coeffs, rhs) in cuts(np.ones(network.numLinks)):
+        m.addConstr(LinExpr(coeffs, variables) >= rhs)
+    for v in y:
+        v.Start = 1.0
+
+    # Step 4: Branch and bound with the Benders cuts as lazy constraints
+    def callback(model, where):
+        if where == GRB.Callback.MIPSOL:
+            stats['lazyRounds'] += 1
+            values = dict(zip(model._vars, model.cbGetSolution(model._vars)))
+            yVal = np.array([values[v] for v in y])
+            for (kind, variables, coeffs, rhs) in cuts(yVal):
+                if sum(c*values[v] for v, c in zip(variables, coeffs)) < rhs - tol*max(1, abs(rhs)):
+                    model.cbLazy(LinExpr(coeffs, variables) >= rhs)
+                    stats[kind] += 1
+
+    m._vars = m.getVars()
+    m.Params.OutputFlag = verbose; m.Params.LazyConstraints = 1
+    if timeLimit is not None:
+        m.Params.TimeLimit = timeLimit
+    m.optimize(callback)
+
+    stats['time'] = time.time() - ts
+    stats['status'] = m.status
+    if m.SolCount == 0:
+        return float("inf"), m.ObjBound, [], stats
+    openLinks = [l for l in range(network.numLinks) if y[l].X > 0.5]
+    return m.objVal, m.ObjBound, openLinks, stats
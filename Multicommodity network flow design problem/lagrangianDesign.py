@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Lagrangian relaxation of the capacitated fixed charge multicommodity network design problem
+
+    min  \sum_l f_l y_l + \sum_c \sum_l c_l x_lc
+    s.t. x_.c is a flow of the commodity c from its origin to its destinations (volumes d)
+         \sum_c x_lc <= u_l y_l          (capacity, multipliers alpha_l >= 0)
+         x_lc <= M_lc y_l                (linking, multipliers beta_lc >= 0, M_lc = min(u_l, d_c))
+         y_l binary
+
+A commodity is an origin (aggregate='origin', one flow with a sink at every destination) or an
+OD pair (aggregate='commodity', L x K multipliers). Without the capacity and linking constraints
+the relaxation splits into
+    - one shortest path tree per commodity on the costs c_l + alpha_l + beta_lc (built in a
+      process pool, as the pricing of pathCG.py),
+    - one decision per link, y_l = 1 if f_l - u_l alpha_l - \sum_c M_lc beta_lc < 0 (NumPy).
+Its value is a lower bound, maximized by a projected subgradient ascent with the step rule of
+SubgradientStep (Subgradient method/Subgradient.py): Polyak steps towards the best design found,
+rho halved when the bound did not improve for K iterations.
+The designs come from slope scaling: multicommodity flows (solvePathCG) with the linearized costs
+c_l + f_l/x_l of the flows x of the previous one, started from the Lagrangian flows.
+
+    LB, UB, y, stats = solveDesignLagrangian(network, demand, fixedCost, flowCost, capacity, processes=8)
+"""
+import multiprocessing, time
+import numpy as np
+from networkGraph import dijkstra
+from pathCG import solvePathCG
+
+
+def initWorker(net):
+    global network
+    network = net
+
+
+def commodityTree(task):
+    '''
+    Shortest path tree of a commodity, returns its cost and the volume on every link
+    '''
+    c, origin, dests, amounts, cost = task
+    label, pred = dijkstra(network, origin, cost)
+    volume = np.zeros(network.numNodes)
+    np.add.at(volume, dests, amounts)
+    flow = np.zeros(network.numLinks)
+    # Nodes of the tree, parents before children (labels can tie on links of cost 0)
+    reached = np.nonzero(pred >= 0)[0]
+    parent = network.tail[pred[reached]]
+    order = np.argsort(parent, kind='stable')
+    start = np.searchsorted(parent[order], np.arange(network.numNodes + 1))
+    children = reached[order]
+    tree = [origin]
+    for n in tree:
+        tree.extend(children[start[n]:start[n + 1]])
+    # The children first, their volume goes to the tail of their pred link
+    for n in reversed(tree):
+        l = pred[n]
+        if l < 0 or volume[n] == 0:
+            continue
+        flow[l] += volume[n]
+        volume[network.tail[l]] += volume[n]
+    return c, amounts @ label[dests], flow
+
+
+def linkVolumes(network, flows):
+    volume = np.zeros(network.numLinks)
+    for k in flows:
+        for (path, amount) in flows[k]:
+            volume[path] += amount
+    return volume
+
+
+def slopeScaling(network, demand, fixedCost, flowCost, capacity, volume, iterations=10, processes=1):
+    '''
+    Designs from the multicommodity flows with the costs flowCost + fixedCost/volume, the volumes
+    of the previous flow (volume for the first one). Returns the best cost, design and volumes
+    (inf, None, None if no flow serves all the demand).
+    '''
+    best = (float("inf"), None, None)
+    floor = demand.demand[demand.demand > 0].min()
+    slope = fixedCost/np.clip(volume, floor, capacity)
+    design = None
+    for t in range(iterations):
+        obj, flows, stats = solvePathCG(network, demand, flowCost + slope, capacity, None, processes, verbose=0)
+        if stats['unserved'] > 1e-6:
+            break
+        volume = linkVolumes(network, flows)
+        y = volume > 1e-9
+        cost = fixedCost[y].sum() + flowCost @ volume
+        if cost < best[0]:
+            best = (cost, y.astype(float), volume)
+        if design is not None and (design == y).all():
+            break
+        design = y
+        slope = np.where(y, fixedCost/np.maximum(volume, 1e-9), slope)
+    return best
+
+
+def solveDesignLagrangian(network, demand, fixedCost, flowCost, capacity, aggregate='origin', maxt=200, rho=1.0, K=20,
+                          heuristicEvery=20, processes=1, tol=1e-4, verbose=1):
+    '''
+    Runs maxt iterations of the subgradient ascent and returns the lower bound, the cost and the
+    links (0/1) of the best design and a dictionary of statistics with the bounds of every iteration.
+    processes is the size of the pool for the trees and the flows of the heuristic.
+    '''
+    ts = time.time()
+    fixedCost = np.asarray(fixedCost, dtype=float)
+    flowCost = np.asarray(flowCost, dtype=float)
+    capacity = np.asarray(capacity, dtype=float)
+
+    # Step 1: Commodities (origin, destinations, amounts) that can be routed
+    commodities = []
+    for o in demand.origins():
+        ods = demand.odsOf(o)
+        ods = ods[demand.demand[ods] > 0]
+        label, pred = dijkstra(network, o, flowCost)
+        ods = ods[np.isfinite(label[demand.dest[ods]])]
+        if aggregate == 'origin':
+            groups = [ods] if len(ods) else []
+        elif aggregate == 'commodity':
+            groups = [ods[i:i + 1] for i in range(len(ods))]
+        else:
+            raise ValueError("Aggregation ({:s}) is not recognized".format(aggregate))
+        commodities += [(o, demand.dest[g], demand.demand[g]) for g in groups]
+    C = len(commodities)
+    M = np.minimum(capacity[:, None], np.array([amounts.sum() for (o, dests, amounts) in commodities])[None, :])
+
+    # Step 2: Trees of the commodities, in a process pool if processes > 1
+    if processes == 1:
+        initWorker(network)
+        trees = lambda costs: map(commodityTree, [(c, o, dests, amounts, costs[:, c]) for c, (o, dests, amounts) in enumerate(commodities)])
+    else:
+        pool = multiprocessing.Pool(processes, initializer=initWorker, initargs=(network,))
+        trees = lambda costs: pool.imap_unordered(commodityTree, [(c, o, dests, amounts, costs[:, c]) for c, (o, dests, amounts) in enumerate(commodities)])
+
+    def lagrangian(alpha, beta):
+        # Step 2.1: Shortest path trees of the commodities
+        flows = np.zeros((network.numLinks, C))
+        value = 0.0
+        for c, cost, flow in trees(flowCost[:, None] + alpha[:, None] + beta):
+            value += cost
+            flows[:, c] = flow
+        # Step 2.2: Design of every link
+        reduced = fixedCost - capacity*alpha - (M*beta).sum(axis=1)
+        y = (reduced < 0).astype(float)
+        value += reduced[reduced < 0].sum()
+        # Step 2.3: Subgradients of the capacity and linking constraints
+        return value, flows.sum(axis=1) - capacity*y, flows - M*y[:, None], flows
+
+    try:
+        # Step 3: First design by slope scaling from the shortest paths
+        alpha = np.zeros(network.numLinks)
+        beta = np.zeros((network.numLinks, C))
+        zlambda, gAlpha, gBeta, flows = lagrangian(alpha, beta)
+        gstar, bestY, bestVolume = slopeScaling(network, demand, fixedCost, flowCost, capacity, flows.sum(axis=1), processes=processes)
+        zbest = zlambda; g = zlambda; age = 0
+        stats = {'LB': [], 'UB': [], 'heuristicTime': 0.0}
+
+        # Step 4: Subgradient ascent
+        iterations = 0
+        for t in range(maxt):
+            iterations = t + 1
+            stats['LB'].append(zlambda); stats['UB'].append(gstar)
+            if verbose == 1:
+                print("# {:5d}: LB = {:14.3f} / UB = {:14.3f}".format(t, zbest, gstar))
+            if gstar < float("inf") and gstar - zbest <= tol*max(1, abs(gstar)):
+                break
+
+            # Step 4.1: Reduce rho if the bound is old (as in SubgradientStep, for a maximization)
+            if zlambda <= g:
+                age += 1
+            else:
+                age = 0; g = zlambda
+            if age > K:
+                age = 0; rho = rho/2; g = zlambda
+
+            # Step 4.2: Projected step towards the best design (or 10% above the bound without one)
+            s = gAlpha @ gAlpha + (gBeta*gBeta).sum()
+            if s <= 1e-12:
+                break
+            target = gstar if gstar < float("inf") else zbest + 0.1*max(1, abs(zbest))
+            step = rho*(target - zlambda)/s
+            alpha = np.maximum(0.0, alpha + step*gAlpha)
+            beta = np.maximum(0.0, beta + step*gBeta)
+            zlambda, gAlpha, gBeta, flows = lagrangian(alpha, beta)
+            zbest = max(zbest, zlambda)
+
+            # Step 4.3: Slope scaling from the Lagrangian flows
+            if (t + 1) % heuristicEvery == 0:
+                start = time.time()
+                obj, y, volume = slopeScaling(network, demand, fixedCost, flowCost, capacity, flows.sum(axis=1), processes=processes)
+                stats['heuristicTime'] += time.time() - start
+                if obj < gstar:
+                    gstar, bestY, bestVolume = obj, y, volume
+    finally:
+        if processes != 1:
+            pool.close()
+            pool.join()
+    stats['iterations'] = iterations
+    stats['volume'] = bestVolume
+    stats['time'] = time.time() - ts
+    return zbest, gstar, bestY, stats
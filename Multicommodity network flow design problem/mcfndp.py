@@ -4,12 +4,17 @@ Created on Tue Jun  7 19:10:24 2022
 
 @author: Pramesh Kumar
 """
-import math, time, heapq
+import math, time
 import numpy as np
+import scipy.sparse
 from gurobipy import *
+from networkGraph import loadNetwork, loadDemand
+from bendersDesign import solveDesignBenders
+from pathCG import solvePathCG
+from lagrangianDesign import solveDesignLagrangian
 
 
-inputLocation = "Chicago Sketch network/"
+inputLocation = "Chicago Sketch Network/"
 
 class Zone:
     def __init__(self, _tmpIn):
@@ -19,128 +24,160 @@ class Zone:
         self.destList = []
 
 
-class Node:
-    '''
-    This class has attributes associated with any node
-    '''
-    def __init__(self, _tmpIn):
-        self.Id = _tmpIn[0]
-        self.lat = 0
-        self.lon = 0
-        self.outLinks = []
-        self.inLinks = []
-        self.label = float("inf")
-        self.pred = ""
-        self.inDegree = 0
-        self.outDegree = 0
-        self.order = 0 # Topological order
-        self.wi = 0.0 # Weight of the node in Dial's algorithm
-        self.xi = 0.0 # Toal flow crossing through this node in Dial's algorithm
-
-
-class Link:
-    '''
-    This class has attributes associated with any link
-    '''
-    def __init__(self, _tmpIn):
-        self.tailNode = _tmpIn[0]
-        self.headNode = _tmpIn[1]
-        self.capacity = float(_tmpIn[2]) # veh per hour
-        self.length = float(_tmpIn[3]) # Length in miles
-        self.fft = float(_tmpIn[4]) # Free flow travel time (min)
-        self.beta = float(_tmpIn[6])
-        self.alpha = float(_tmpIn[5])
-        self.speedLimit = float(_tmpIn[7])
-        #self.toll = float(_tmpIn[9])
-        #self.linkType = float(_tmpIn[10])
-        self.flow = 0.0
-        self.cost =  float(_tmpIn[4])*VOT #float(_tmpIn[4])*(1 + float(_tmpIn[5])*math.pow((float(_tmpIn[7])/float(_tmpIn[2])), float(_tmpIn[6])))
-        self.construction_cost =  float(_tmpIn[3])*constr_cost_per_mi
-        self.cost_derivative = 0.0 # For CFW 
-        self.target = 0.0  # For CFW
-
-class OD:
-    '''
-    This class has attributes associated to origin-destination pair
-    '''
-    def __init__(self, _tmpIn):
-        self.origin = _tmpIn[0]
-        self.dest = _tmpIn[1]
-        self.dem = float(_tmpIn[2])
-
-
-
-
 def readNetwork():
-    inFile = open(inputLocation + "network.dat")
-    tmpIn = inFile.readline().strip().split("\t")
-    for x in inFile:
-        tmpIn = x.strip().split("\t")
-        linkSet[tmpIn[0], tmpIn[1]] = Link(tmpIn)
-        if tmpIn[0] not in nodeSet:
-            nodeSet[tmpIn[0]] = Node(tmpIn[0])
-        if tmpIn[1] not in nodeSet:
-            nodeSet[tmpIn[1]] = Node(tmpIn[1])
-        if tmpIn[1] not in nodeSet[tmpIn[0]].outLinks:
-            nodeSet[tmpIn[0]].outLinks.append(tmpIn[1])
-        if tmpIn[0] not in nodeSet[tmpIn[1]].inLinks:
-            nodeSet[tmpIn[1]].inLinks.append(tmpIn[0])
-
-    inFile.close()
-    print(len(nodeSet), "nodes")
-    print(len(linkSet), "links")
-    
+    network = loadNetwork(inputLocation + "network.dat")
+    network.cost = network.fft*VOT
+    network.construction_cost = network.length*constr_cost_per_mi
+    print(network.numNodes, "nodes")
+    print(network.numLinks, "links")
+    return network
+
 def readDemand():
-    inFile = open(inputLocation + "demand.dat")
-    tmpIn = inFile.readline().strip().split("\t")
-    for x in inFile:
-        tmpIn = x.strip().split("\t")
-        if (tmpIn[0], tmpIn[1]) not in tripSet:
-            tripSet[tmpIn[0], tmpIn[1]] = OD(tmpIn)
-    
+    demand = loadDemand(inputLocation + "demand.dat", network)
+    print(demand.numODs, "OD pairs")
+    return demand
+
 
         
 ###########################################################################################################################
 
-def mcfndp_gurobi():
+def decomposeFlow(origin, flow, sinks, eps=1e-9):
+    '''
+    Splits the flow on the links (array) leaving origin into paths to the sinks, a list of
+    (k, dest, amount). Returns {k: [(links from dest to origin, amount), ...]}.
+    '''
+    flow = np.array(flow, dtype=float)
+    paths = {}
+    for k, dest, amount in sinks:
+        paths[k] = []
+        while amount > eps:
+            # Follow the largest remaining flow back from the destination
+            path = []
+            node = dest
+            while node != origin and len(path) <= network.numNodes:
+                inLinks = network.inLinksOf(node)
+                l = inLinks[np.argmax(flow[inLinks])]
+                if flow[l] <= eps:
+                    break
+                path.append(l)
+                node = network.tail[l]
+            if node != origin:
+                print("Flow of", k, "is short by", amount)
+                break
+            sent = min(amount, flow[path].min())
+            flow[path] -= sent
+            amount -= sent
+            paths[k].append((path, sent))
+    return paths
+
+
+def mcfndp_gurobi(aggregate=None):
+    '''
+    aggregate=None has one flow per link and OD pair, 'origin' one flow per link and origin with a
+    sink at every destination of the origin (fewer variables and constraints by the number of
+    destinations per origin, valid as long as the links have no capacity per OD pair). In both cases
+    the flows are split back into the paths of the OD pairs.
+    Returns the objective and {OD pair: [(links from dest to origin, flow), ...]}.
+    '''
     print("---------------------------------------\n")
     print("Solving using gurobi: \n")
     print("---------------------------------------\n")
+    # Step 1: Commodities with their origin and sinks (OD pair, destination, demand)
+    if aggregate is None:
+        commodities = [(demand.origin[k], [(k, demand.dest[k], demand.demand[k])]) for k in range(demand.numODs)]
+    elif aggregate == 'origin':
+        commodities = [(o, [(k, demand.dest[k], demand.demand[k]) for k in demand.odsOf(o)]) for o in demand.origins()]
+    else:
+        raise ValueError("Aggregation ({:s}) is not recognized".format(aggregate))
+
+    # Step 2: Flow of every commodity (commodity major), the conservation constraints of all the
+    # commodities in one block diagonal matrix of the node-link incidence matrix
+    K, L, N = len(commodities), network.numLinks, network.numNodes
+    rhs = np.zeros((K, N))
+    for k, (origin, sinks) in enumerate(commodities):
+        dests = [dest for (od, dest, amount) in sinks]
+        amounts = [amount for (od, dest, amount) in sinks]
+        rhs[k, origin] += sum(amounts)
+        np.add.at(rhs[k], dests, -np.array(amounts))
     m = Model()
-    x = {(k[0], k[1], o, d): m.addVar(lb = 0.0, vtype = GRB.CONTINUOUS, name = str(k[0]) + "," + str(k[1])) for k in linkSet for (o,d) in tripSet}
-    
-    m.update()
-    for (o,d) in tripSet:
-        for i in nodeSet:
-            if i == o:
-                m.addConstr(sum([x[i, j] for j in nodeSet[i].outLinks]) - sum([x[j, i] for j in nodeSet[i].inLinks])  == tripSet[o,])
-            elif i == d:
-                m.addConstr(sum([x[i, j] for j in nodeSet[i].outLinks]) - sum([x[j, i] for j in nodeSet[i].inLinks]) == 0)
-            else:                        
-                m.addConstr(sum([x[i, j] for j in nodeSet[i].outLinks]) - sum([x[j, i] for j in nodeSet[i].inLinks]) == 0)
-
-    obj = sum([x[k]*linkSet[k].fft for k in linkSet])    
-    m.setObjective(obj, sense=GRB.MINIMIZE); m.update(); m.Params.OutputFlag = 0; m.Params.InfUnbdInfo = 1; m.Params.DualReductions = 0
+    x = m.addMVar(K*L, lb = 0.0, vtype = GRB.CONTINUOUS)
+    m.addMConstr(scipy.sparse.kron(scipy.sparse.identity(K, format='csr'), network.incidence(), format='csr'), x, GRB.EQUAL, rhs.ravel())
+
+    m.setObjective(np.tile(network.fft, K) @ x, sense=GRB.MINIMIZE); m.update(); m.Params.OutputFlag = 0; m.Params.InfUnbdInfo = 1; m.Params.DualReductions = 0
     m.optimize()
+    flows = x.X.reshape(K, L)
     print('Final path found')
-    print({l for l in linkSet if x[l].x != 0})
+    print(set(network.linkIds(np.nonzero(flows.sum(axis=0) > 0)[0])))
     print('ObjVal', m.objVal)
 
+    # Step 3: Paths of the OD pairs
+    odPaths = {}
+    for k, (origin, sinks) in enumerate(commodities):
+        odPaths.update(decomposeFlow(origin, flows[k], sinks))
+    return m.objVal, odPaths
+
+
+def mcfndp_benders(aggregate='origin', timeLimit=None):
+    '''
+    Fixed charge design of the links (construction_cost) with the routing cost of the demand,
+    solved by Benders decomposition (bendersDesign.py) instead of one flow variable per link and
+    OD pair
+    '''
+    print("---------------------------------------\n")
+    print("Solving using Benders decomposition: \n")
+    print("---------------------------------------\n")
+    obj, bound, openLinks, stats = solveDesignBenders(network, demand, network.construction_cost, network.cost, aggregate, timeLimit)
+    print('Links built')
+    print(network.linkIds(openLinks))
+    print('ObjVal', obj, 'bound', bound)
+    print('Lazy rounds', stats['lazyRounds'], 'optimality cuts', stats['optimalityCuts'], 'feasibility cuts', stats['feasibilityCuts'],
+          'time', round(stats['time'], 2), 'secs')
+    return obj, openLinks
+
+def mcfndp_pathCG(design=False, processes=None):
+    '''
+    Multicommodity flow with the link capacities by path column generation (pathCG.py), with the
+    construction costs of a linear design if design=True. The flows cost network.cost, as in
+    mcfndp_benders and mcfndp_lagrangian, so the three objectives can be compared. The pricing trees of the origins are
+    built by processes processes (all the cores with None).
+    '''
+    print("---------------------------------------\n")
+    print("Solving using path column generation: \n")
+    print("---------------------------------------\n")
+    fixedCost = network.construction_cost if design else None
+    obj, flows, stats = solvePathCG(network, demand, network.cost, network.capacity, fixedCost, processes)
+    print('ObjVal', obj, 'unserved demand', stats['unserved'])
+    print('Iterations', stats['iterations'], 'paths', stats['columns'], 'pricing', round(stats['pricingTime'], 2),
+          'master', round(stats['masterTime'], 2), 'time', round(stats['time'], 2), 'secs')
+    return obj, flows
+
+def mcfndp_lagrangian(maxt=200, processes=None):
+    '''
+    Bounds of the capacitated design (construction_cost, capacity) by Lagrangian relaxation of the
+    capacity and linking constraints with designs by slope scaling (lagrangianDesign.py)
+    '''
+    print("---------------------------------------\n")
+    print("Solving using Lagrangian relaxation: \n")
+    print("---------------------------------------\n")
+    LB, UB, y, stats = solveDesignLagrangian(network, demand, network.construction_cost, network.cost, network.capacity,
+                                             maxt=maxt, processes=processes, verbose=0)
+    print('Links built')
+    print(network.linkIds(np.nonzero(y)[0]) if y is not None else None)
+    print('LB', LB, 'UB', UB, 'iterations', stats['iterations'], 'time', round(stats['time'], 2), 'secs')
+    return LB, UB, y
+
 ###########################################################################################################################
 readStart = time.time()
 VOT = 23 # $/hr
 constr_cost_per_mi = 5e6 # $/mi
 
 
-tripSet = {}
-linkSet = {}
-nodeSet = {}
 zoneSet = {}
 
 
 
-readNetwork()
-readDemand()
+network = readNetwork()
+demand = readDemand()
 
 
 print("Reading the network data took", round(time.time() - readStart, 2), "secs")
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Path based column generation for the multicommodity flow problem with link capacities and
+design costs (linear relaxation)
+
+    min  \sum_l f_l y_l + \sum_k \sum_p d_k c_p lambda_kp
+    s.t. \sum_p lambda_kp + s_k = 1                          for every OD pair k   (dual sigma_k)
+         \sum_k \sum_{p through l} d_k lambda_kp <= u_l y_l    for every link l      (dual w_l <= 0)
+         0 <= y_l <= 1 (y_l = 1 without design costs),  lambda, s >= 0
+
+The unserved demand s_k has the cost M d_k with M larger than the cost of any path, so the first
+master (one shortest path per OD pair) is feasible even if the paths exceed the capacities. The
+path of k has the reduced cost d_k \sum_{l in p} (c_l - w_l) - sigma_k, so one shortest path tree
+on c - w per origin prices all its destinations. The trees of the origins are built in a process
+pool (as in the batch column generation of the shortest path with resource constraint).
+
+    obj, paths, stats = solvePathCG(network, demand, flowCost, capacity, fixedCost, processes=8)
+"""
+import multiprocessing, time
+import numpy as np
+from gurobipy import *
+from networkGraph import dijkstra, tracePreds
+
+
+def initWorker(net):
+    global network
+    network = net
+
+
+def originTree(task):
+    origin, cost = task
+    label, pred = dijkstra(network, origin, cost)
+    return origin, label, pred
+
+
+def solvePathCG(network, demand, flowCost, capacity=None, fixedCost=None, processes=1, maxIter=1000, tol=1e-6, verbose=1):
+    '''
+    capacity=None leaves the links uncapacitated, fixedCost=None fixes the design (y = 1).
+    processes is the size of the pool for the pricing trees (1 to build them here).
+    Returns the objective, {OD pair: [(links from dest to origin, flow), ...]} and a dictionary
+    of statistics (the unserved demand and the design y included).
+    '''
+    ts = time.time()
+    flowCost = np.asarray(flowCost, dtype=float)
+    origins = demand.origins()
+    if fixedCost is not None and capacity is None:
+        # Every link can then carry all the demand once it is built
+        capacity = np.full(network.numLinks, demand.demand.sum())
+    stats = {'iterations': 0, 'columns': 0, 'pricingTime': 0.0, 'masterTime': 0.0}
+
+    # Step 1: Pricing trees, in a process pool if processes > 1
+    if processes == 1:
+        initWorker(network)
+        trees = lambda cost: map(originTree, [(o, cost) for o in origins])
+    else:
+        pool = multiprocessing.Pool(processes, initializer=initWorker, initargs=(network,))
+        trees = lambda cost: pool.imap_unordered(originTree, [(o, cost) for o in origins], chunksize=max(1, len(origins)//(4*(processes or multiprocessing.cpu_count()))))
+
+    try:
+        # Step 2: Master with the unserved demand, the capacities and the design variables
+        m = Model()
+        M = flowCost.sum() + (0.0 if fixedCost is None else (np.asarray(fixedCost)/np.maximum(capacity, 1e-9)).sum())
+        unserved = [m.addVar(lb = 0.0, obj = M*demand.demand[k], vtype = GRB.CONTINUOUS) for k in range(demand.numODs)]
+        m.update()
+        convConstrs = [m.addConstr(unserved[k] == 1) for k in range(demand.numODs)]
+        capConstrs = []
+        if capacity is not None:
+            if fixedCost is None:
+                capConstrs = [m.addConstr(LinExpr() <= capacity[l]) for l in range(network.numLinks)]
+            else:
+                y = [m.addVar(lb = 0.0, ub = 1.0, obj = fixedCost[l], vtype = GRB.CONTINUOUS) for l in range(network.numLinks)]
+                m.update()
+                capConstrs = [m.addConstr(-capacity[l]*y[l] <= 0) for l in range(network.numLinks)]
+        m.Params.OutputFlag = 0
+        paths = {k: [] for k in range(demand.numODs)}
+        keys = set()
+
+        def addPath(k, path):
+            key = (k, tuple(path))
+            if key in keys:
+                return False
+            keys.add(key)
+            c = Column()
+            c.addTerms(1.0, convConstrs[k])
+            if capConstrs:
+                c.addTerms([demand.demand[k]]*len(path), [capConstrs[l] for l in path])
+            paths[k].append((path, m.addVar(lb = 0.0, obj = demand.demand[k]*flowCost[path].sum(), vtype = GRB.CONTINUOUS, column = c)))
+            stats['columns'] += 1
+            return True
+
+        # Step 3: Column generation, one pricing tree per origin on c - w
+        linkDuals = np.zeros(network.numLinks)
+        convDuals = None
+        while stats['iterations'] < maxIter:
+            start = time.time()
+            added = 0
+            for origin, label, pred in trees(flowCost - linkDuals):
+                for k in demand.odsOf(origin):
+                    dest = demand.dest[k]
+                    if np.isinf(label[dest]):
+                        continue
+                    if convDuals is None or demand.demand[k]*label[dest] - convDuals[k] < -tol*max(1, abs(convDuals[k])):
+                        added += addPath(k, tracePreds(network, pred, dest))
+            stats['pricingTime'] += time.time() - start
+            if added == 0:
+                break
+
+            start = time.time()
+            m.optimize()
+            stats['masterTime'] += time.time() - start
+            stats['iterations'] += 1
+            convDuals = np.array(m.getAttr('Pi', convConstrs))
+            if capConstrs:
+                linkDuals = np.array(m.getAttr('Pi', capConstrs))
+            if verbose == 1:
+                print("* Iteration {:3d}: {:12.3f}   {:6d} paths added".format(stats['iterations'], m.objVal, added))
+
+        # No path was added (no OD pair can be reached), the master only has the unserved demand
+        if stats['iterations'] == 0:
+            m.optimize()
+    finally:
+        if processes != 1:
+            pool.close()
+            pool.join()
+
+    # Step 4: Path flows, unserved demand and design
+    flows = {k: [(path, demand.demand[k]*lamb.X) for (path, lamb) in paths[k] if lamb.X > 1e-9] for k in paths}
+    stats['unserved'] = float(sum(demand.demand[k]*unserved[k].X for k in range(demand.numODs)))
+    if fixedCost is not None:
+        stats['y'] = np.array([v.X for v in y])
+    stats['time'] = time.time() - ts
+    return m.objVal, flows, stats
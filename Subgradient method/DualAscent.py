@@ -0,0 +1,189 @@
+'''
+Volume and proximal bundle methods for the Lagrangian dual of the Uncapacitated Facility Location Problem
+
+Both methods minimize the same dual function z(lamb) as the subgradient method of Subgradient.py
+and use its ComputeLagrangian oracle and LagrangianHeuristic, but also return a primal estimate
+(xbar, ybar), a convex combination of the Lagrangian solutions that tends to an optimal solution
+of the LP relaxation.
+
+- Volume algorithm (Barahona and Anbil, 2000): the direction is an exponential average of the
+  subgradients, the same average of the Lagrangian solutions gives the primal estimate.
+- Proximal bundle: the next multipliers minimize the cutting plane model of z plus
+  u/2 ||lamb - center||^2 (a QP solved with Gurobi), the duals of the cuts give the weights of
+  the primal estimate.
+
+Every method returns a dictionary with the bounds, the primal estimate, the number of oracle
+calls and the time, see CompareDualMethods.
+'''
+
+
+import numpy as np
+from gurobipy import *
+import time
+from Subgradient import generateFacilityLocationData, FacilityLocationHeuristic, ComputeLagrangian, LagrangianHeuristic, SubgradientMethod
+
+
+def PrimalEstimateValue(p,f,xbar,ybar):
+    # Step 1: Objective and violation of \sum_j y_ij = 1 of the primal estimate
+    return np.sum(p*ybar) - f @ xbar, np.abs(1 - ybar.sum(axis=1)).max()
+
+def VolumeAlgorithm(C,F,p,f,lamb,maxt=1000,theta=0.1,alphaMax=0.1,tol=1e-4,verbose=0):
+    start = time.time()
+    # Step 1: Initialize the center, the primal estimate and the direction
+    gstar, bestx, besty = FacilityLocationHeuristic(C,F,p,f)
+    zbar, v, xbar, ybar = ComputeLagrangian(C,F,p,f,lamb)
+    lambar = np.array(lamb, dtype=float)
+    calls = 1; reds = 0; iterations = 0; zcheck = zbar
+
+    for t in range(maxt):
+        iterations = t + 1
+        # Step 2: Step from the center along the averaged direction, towards the target gstar
+        vv = v @ v
+        if vv <= 1e-12:
+            break
+        lamb = lambar - theta*(zbar - gstar)/vv*v
+
+        # Step 3: Call the oracle and try to repair the Lagrangian solution
+        zlambda, sublambda, x, y = ComputeLagrangian(C,F,p,f,lamb)
+        calls += 1
+        obj, xx, yy = LagrangianHeuristic(C,F,p,f,x,y)
+        if obj > gstar:
+            gstar = obj; bestx = xx; besty = yy
+
+        # Step 4: Color of the iteration, d >= 0 means that lamb is not past a minimum along v
+        d = sublambda @ v
+        if zlambda < zbar:
+            theta = min(1.1*theta, 2) if d >= 0 else theta
+            lambar = lamb; zbar = zlambda; reds = 0
+        else:
+            reds += 1
+            if reds >= 20:
+                theta = max(0.66*theta, 1e-5); reds = 0
+
+        # Step 5: alpha minimizes ||alpha sublambda + (1 - alpha) v||, bounded by alphaMax, and
+        #         alphaMax is halved when the dual bound did not improve 1% in 100 iterations
+        if t % 100 == 99:
+            if zbar > zcheck - 0.01*abs(zcheck - gstar):
+                alphaMax = max(alphaMax/2, 1e-5)
+            zcheck = zbar
+        dd = sublambda - v
+        alpha = alphaMax if dd @ dd <= 1e-12 else min(max(-(v @ dd)/(dd @ dd), alphaMax/10), alphaMax)
+        xbar = alpha*x + (1 - alpha)*xbar
+        ybar = alpha*y + (1 - alpha)*ybar
+        v = alpha*sublambda + (1 - alpha)*v
+
+        # Step 6: Stop when the dual bound meets the heuristic or the primal estimate
+        value, violation = PrimalEstimateValue(p,f,xbar,ybar)
+        if verbose == 1:
+            print("# {:5d}: UB = {:10.3f} LB = {:10.3f} primal = {:10.3f} violation = {:6.4f} theta = {:6.4f}".format(t, zbar, gstar, value, violation, theta))
+        if zbar - gstar <= tol*max(1, abs(zbar)):
+            break
+        if violation <= 0.01 and abs(zbar - value) <= tol*max(1, abs(zbar)):
+            break
+
+    return {'method': 'volume', 'UB': zbar, 'LB': gstar, 'lamb': lambar, 'xbar': xbar, 'ybar': ybar,
+            'x': bestx, 'y': besty, 'calls': calls, 'iterations': iterations, 'time': time.time() - start}
+
+def ProximalBundle(C,F,p,f,lamb,maxt=1000,u=None,m=0.1,maxBundle=50,tol=1e-6,verbose=0):
+    start = time.time()
+    # Step 1: Evaluate the center
+    gstar, bestx, besty = FacilityLocationHeuristic(C,F,p,f)
+    center = np.array(lamb, dtype=float)
+    zcenter, sublambda, x, y = ComputeLagrangian(C,F,p,f,center)
+    calls = 1
+    if u is None:
+        # Same scale as the first step of the subgradient method
+        u = max(sublambda @ sublambda, 1)/max(zcenter - gstar, 1)
+
+    # Step 2: QP of the stabilized cutting plane model
+    #         min r + u/2 ||lamb - center||^2  s.t. r >= z_k + g_k (lamb - lamb_k) for every cut k
+    qp = Model()
+    qp.Params.OutputFlag = 0
+    lam = qp.addMVar(C, lb=-GRB.INFINITY)
+    r = qp.addVar(lb=-GRB.INFINITY)
+    qp.setObjective(r + (u/2)*(lam @ lam) - (u*center) @ lam, GRB.MINIMIZE)
+    bundle = []
+
+    def addCut(zk, gk, lamk, xk):
+        # The Lagrangian solution y_k is recomputed from lamb_k and x_k when it is needed
+        constr = qp.addLConstr(LinExpr(np.append(-gk, 1).tolist(), lam.tolist() + [r]), GRB.GREATER_EQUAL, float(zk - gk @ lamk))
+        bundle.append([constr, lamk, xk])
+
+    addCut(zcenter, sublambda, center, x)
+    weights = np.ones(1)
+    iterations = 0
+    for t in range(maxt):
+        iterations = t + 1
+        # Step 3: Candidate multipliers and predicted decrease of the model
+        qp.optimize()
+        if qp.status != GRB.OPTIMAL:
+            raise RuntimeError("Bundle QP is not optimal, status {}".format(qp.status))
+        lamb = lam.X
+        weights = np.array(qp.getAttr('Pi', [k[0] for k in bundle]))
+        delta = zcenter - r.X
+        if delta <= tol*max(1, abs(zcenter)) or zcenter - gstar <= 1e-4:
+            break
+
+        # Step 4: Call the oracle at the candidate
+        zlambda, sublambda, x, y = ComputeLagrangian(C,F,p,f,lamb)
+        calls += 1
+        obj, xx, yy = LagrangianHeuristic(C,F,p,f,x,y)
+        if obj > gstar:
+            gstar = obj; bestx = xx; besty = yy
+
+        # Step 5: Serious step if enough of the predicted decrease is achieved, otherwise null step
+        if zcenter - zlambda >= m*delta:
+            if zcenter - zlambda >= 0.9*delta:
+                u = u/2
+            center = lamb; zcenter = zlambda
+            qp.setObjective(r + (u/2)*(lam @ lam) - (u*center) @ lam, GRB.MINIMIZE)
+
+        # Step 6: Keep the cuts with a positive weight when the bundle is too large
+        if len(bundle) >= maxBundle:
+            inactive = [k for k in range(len(bundle)) if weights[k] <= 1e-9]
+            for k in reversed(inactive[:len(bundle) - maxBundle + 1]):
+                qp.remove(bundle[k][0])
+                del bundle[k]
+                weights = np.delete(weights, k)
+        addCut(zlambda, sublambda, lamb, x)
+        weights = np.append(weights, 0)
+
+        if verbose == 1:
+            print("# {:5d}: UB = {:10.3f} LB = {:10.3f} predicted = {:10.3f} u = {:8.5f} bundle = {:3d}".format(t, zcenter, gstar, delta, u, len(bundle)))
+
+    # Step 7: Primal estimate from the weights of the cuts
+    xbar = np.zeros(F); ybar = np.zeros((C,F))
+    for (constr, lamk, xk), w in zip(bundle, weights):
+        if w > 1e-9:
+            xbar += w*xk
+            ybar += w*((p - lamk[:, None] >= 0) & (xk > 0.5))
+    return {'method': 'bundle', 'UB': zcenter, 'LB': gstar, 'lamb': center, 'xbar': xbar, 'ybar': ybar,
+            'x': bestx, 'y': besty, 'calls': calls, 'iterations': iterations, 'time': time.time() - start}
+
+def RunSubgradient(C,F,p,f,lamb,maxt=10000):
+    start = time.time()
+    zbest, gstar, lamb, calls, x, y = SubgradientMethod(C,F,p,f,lamb,maxt,verbose=0)
+    return {'method': 'subgradient', 'UB': zbest, 'LB': gstar, 'lamb': lamb, 'x': x, 'y': y,
+            'calls': calls, 'iterations': calls, 'time': time.time() - start}
+
+def CompareDualMethods(C,F,p,f,maxt=1000):
+    # Step 1: Run every method from lamb = 0
+    results = [RunSubgradient(C,F,p,f,np.zeros(C),maxt),
+               VolumeAlgorithm(C,F,p,f,np.zeros(C),maxt),
+               ProximalBundle(C,F,p,f,np.zeros(C),maxt)]
+
+    # Step 2: Print the statistics side by side
+    print("{:12s} {:>12s} {:>12s} {:>8s} {:>8s} {:>8s}".format('method', 'UB', 'LB', 'gap %', 'calls', 'time'))
+    for res in results:
+        gap = 100*(res['UB'] - res['LB'])/max(1, abs(res['UB']))
+        print("{:12s} {:12.3f} {:12.3f} {:8.3f} {:8d} {:8.2f}".format(res['method'], res['UB'], res['LB'], gap, res['calls'], res['time']))
+    return results
+
+
+###########################################################################################################
+if __name__ == '__main__':
+    # Step 1: Generate problem instance
+    C, F, p, f = generateFacilityLocationData(100, 50)
+
+    # Step 2: Run the methods side by side
+    CompareDualMethods(C,F,p,f,1000)
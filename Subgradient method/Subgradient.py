@@ -9,9 +9,7 @@ def generateFacilityLocationData(C, F):
     np.random.seed(1234)
     p =  np.random.randint(1000, size=(C, F))
     f = np.random.randint(1000, size=(F))
-    for j in range(F):
-        for i in range(C):
-            f[j] += round(0.05*p[i,j])
+    f += np.round(0.05*p).sum(axis=0).astype(f.dtype)
 
     return(C, F, p, f)
 
@@ -21,56 +19,54 @@ def FacilityLocationHeuristic(C, F, p, f):
 
     # Step 2: Find the best assignment of customer i to a Facility
     #         Implement assignment and open facility
-    for i in range(C):        
-        idx = np.where(p[i,:] == np.amin(p[i,:]))[0][0]
-        y[i,idx]=1;
-        x[idx]=1;
+    idx = np.argmin(p, axis=1)
+    y[np.arange(C), idx] = 1
+    x[idx] = 1
 
     # Step 3: Compute objective value of computed solution
-    val=0;
-    for j in range(F):
-        val=val-f[j]*x[j];
-        for i in range(C):
-            val=val+p[i,j]*y[i,j];
+    val = np.sum(p*y) - f @ x
 
     # Step 4: Ouput heuristic solution and value
     return(val, x, y);
 
 def ComputeLagrangian(C,F,p,f,lamb):
-
-    # Step 1: Initalize ouput variables
-    sublambda=np.zeros(C); x=np.zeros(F);  y=np.zeros((C,F));
+    '''
+    Lagrangian oracle with the array operations over p - lamb[:,None], the same result as the
+    loops over i and j: y_ij = 1 if p_ij - lamb_i >= 0 and facility j is open, facility j is open
+    if \sum_i max(p_ij - lamb_i, 0) - f_j >= 0
+    '''
+    # Step 1: Reduced profits of every customer and facility
+    d = p - lamb[:, None]
+    positive = d >= 0
 
     # Step 2: Compute Lagrangian value
-    zlambda=0;
-    for j in range(F):
-        t=0;
-        for i in range(C):
-            tt=p[i,j]-lamb[i];
-            if (tt>=0):
-                y[i,j]=1;
-                t+=tt;
-        ttt=t-f[j];
-        if (ttt>=0):
-            zlambda=zlambda+ttt;
-            x[j]=1;
-        else:
-            for i in range(C):
-                y[i,j]=0;
-
-    for i in range(C):
-        zlambda=zlambda+lamb[i];
+    ttt = np.maximum(d, 0, out=d).sum(axis=0) - f
+    isOpen = ttt >= 0
+    x = isOpen.astype(float)
+    zlambda = ttt[isOpen].sum() + lamb.sum()
+    positive &= isOpen
+    y = positive.astype(float)
 
     # Step 3: Compute subgradient
-    for i in range(C):
-        sublambda[i]=1;
-        for j in range(F):
-            sublambda[i]=sublambda[i]-y[i,j];
-
+    sublambda = 1 - y.sum(axis=1)
 
     # Step 4: Return output values
     return(zlambda,sublambda,x,y);
 
+def ComputeLagrangianBatch(C,F,p,f,lambs):
+    '''
+    ComputeLagrangian for B multiplier vectors at once, lambs is a B x C array. Returns zlambda (B),
+    sublambda (B x C), x (B x F) and y (B x C x F). Needs memory for B*C*F entries.
+    '''
+    d = p[None, :, :] - lambs[:, :, None]
+    positive = d >= 0
+    ttt = np.where(positive, d, 0).sum(axis=1) - f
+    x = (ttt >= 0).astype(float)
+    zlambda = np.where(ttt >= 0, ttt, 0).sum(axis=1) + lambs.sum(axis=1)
+    y = (positive & (ttt >= 0)[:, None, :]).astype(float)
+    sublambda = 1 - y.sum(axis=2)
+    return(zlambda,sublambda,x,y);
+
 def LagrangianHeuristic(C,F,p,f,x,y):
 
 # Step 1: Initialize output variables
@@ -78,56 +74,46 @@ def LagrangianHeuristic(C,F,p,f,x,y):
     newy=np.zeros((C,F))
 
 # Step 2: If no facility is open, open one randomly
-    nopen=0;
-    for j in range(F):
-        nopen+=x[j];
-    
+    nopen=np.sum(x);
+
     if (nopen==0):
         np.random.seed(1234)
         idx = np.random.randint(10)
         x[idx] = 1
-    
+
 
 # Step 3: For each customer, keep a single assignment of the current solution
 #         (if multiple assignments are in the lagrangian solution) or create
 #         one if no assignment exist ... open facilities as required
-    for i in range(C):
-        minp=float("inf");minpp=float("inf");
-        minidx=-1;minidxpp=-1;
-        for j in range(F):
-            if (y[i,j]>0.5):
-                if (p[i,j]<minp):
-                    minp=p[i,j];
-                    minidx=j;
-
-            if (x[j]>0.5):
-                if (p[i,j]<minpp):
-                    minpp=p[i,j];
-                    minidxpp=j;
-                    
-        if (minidx>0):
-            newy[i,minidx]=1;
-            newx[minidx]=1;
-        else:
-            newy[i,minidxpp]=1;
-            newx[minidxpp]=1;
+    # Facilities that are not allowed get a penalty larger than any profit, argmin keeps the first minimum
+    penalty = 2*np.abs(p).max() + 1
+    assigned = y > 0.5
+    minidx = np.where(assigned.any(axis=1), np.argmin(p + ~assigned*penalty, axis=1), -1)
+    isOpen = x > 0.5
+    if isOpen.all():
+        minidxpp = np.argmin(p, axis=1)
+    elif isOpen.any():
+        minidxpp = np.argmin(p + ~isOpen*penalty, axis=1)
+    else:
+        minidxpp = np.full(C, -1)
+    # Only assignments to facilities other than the first one are kept, as in the loop version
+    idx = np.where(minidx > 0, minidx, minidxpp)
+    rows = np.arange(C)
+    newy[rows, idx] = 1
+    newx[idx] = 1
 
 
 # Step 4: Compute the value of the heuristic solution created
-    obj=0;
-    for j in range(F):
-        obj-=f[j]*newx[j];
-        for i in range(C):
-            obj+=p[i,j]*newy[i,j];
+    obj = p[rows, idx].sum() - f @ newx
 
 
 # Step 5: Return output variables
     return obj,newx,newy;
 
-def SubgradientStep(zlambda, C, lamb, sublambda, rho, K, g, gstar, age):
+def SubgradientStep(zlambda, C, lamb, sublambda, rho, K, g, gstar, age, verbose=1):
 
     # Step 1: initialize working variables
-    alpha=0; done='n'; newlambda=np.zeros(C);
+    alpha=0; done='n';
 
     # Step 2: If solution has not improved, increase its age
     if (zlambda>=g):
@@ -141,15 +127,15 @@ def SubgradientStep(zlambda, C, lamb, sublambda, rho, K, g, gstar, age):
         age=0;
         rho=rho/2;
         g=zlambda;
-    
-    print("        ... rho= {:5.2f},".format(rho))
+
+    if verbose == 1:
+        print("        ... rho= {:5.2f},".format(rho))
 
     # Step 4: Compute square norm of subgradient
-    s=0;
-    for i in range(C):
-        s+= sublambda[i]*sublambda[i];
+    s = sublambda @ sublambda
 
-    print(" s= {:5.2f},".format(s));
+    if verbose == 1:
+        print(" s= {:5.2f},".format(s));
 
     # Step 5: If subgradient is zero, solution is optimal
     if (s<=1e-6):
@@ -158,49 +144,68 @@ def SubgradientStep(zlambda, C, lamb, sublambda, rho, K, g, gstar, age):
 
     # Step 6: Compute step size
     alpha=(zlambda-gstar)*rho/s;
-    print(" alpha = {:5.2f} ...\n".format(alpha))
+    if verbose == 1:
+        print(" alpha = {:5.2f} ...\n".format(alpha))
 
     # Step 7: Perform solution update
-    for i in range(C):
-        newlambda[i]=lamb[i]-alpha*sublambda[i];
+    newlambda = lamb - alpha*sublambda
 
     # Step 8: Return new solution and updated algo parameters
     return newlambda, rho, g, age, done;
 
 
-###########################################################################################################
-# Step 1: Initalize algorithms parameters
-rho = 1; K = 5; age = 10; g = float("inf"); maxt = 10000; C = 10; F = 10; lamb = np.zeros(C);
-
-# Step 2: Generate problem instance
-C, F, p, f = generateFacilityLocationData(C,F)
-
-# Step 3: Create a greedy heuristic solution
-gstar, xx, yy = FacilityLocationHeuristic(C,F,p,f)
+def SubgradientMethod(C,F,p,f,lamb,maxt=10000,rho=1,K=5,age=10,verbose=1):
+    '''
+    Runs maxt iterations of the subgradient algorithm from lamb and returns the best upper bound,
+    the best lower bound, the last multipliers, the number of oracle calls and the heuristic solution
+    '''
+    # Step 1: Create a greedy heuristic solution
+    g = float("inf"); zbest = float("inf")
+    gstar, xx, yy = FacilityLocationHeuristic(C,F,p,f)
+    bestx, besty = xx, yy
+
+    # Step 2: Perform maxt iterations of the subgradient algorithm
+    iterations = 0
+    for t in range(maxt):
+        iterations = t + 1
+        # Step 2.1: Compute lagragian relaxation based on lambda
+        zlambda,sublambda,x,y = ComputeLagrangian(C,F,p,f,lamb)
+        zbest = min(zbest, zlambda)
+        if verbose == 1:
+            print("# {:5d}: ".format(t))
+            print("UB = {:8.3f} ".format(zlambda))
+
+        # Step 2.2: Modify the lagrangian solution into a feasible solution
+        obj,xx,yy = LagrangianHeuristic(C,F,p,f,x,y)
+        if (obj>gstar):
+            gstar=obj; bestx=xx; besty=yy;
+
+        if verbose == 1:
+            print("/ LB = {:8.3f}".format(gstar))
+        if ((zlambda-gstar)<=1e-4):
+            if verbose == 1:
+                print("\nCurrent solution is optimal \n");
+                print(xx);print("\n");
+            break;
+
+        # Step 2.3: Perform a subgradient step
+        lamb, rho, g, age, done = SubgradientStep(zlambda, C, lamb, sublambda, rho, K, g, gstar, age, verbose)
+        if (done=='y'):
+            if verbose == 1:
+                print("\nCurrent solution is optimal \n");
+                print(xx);print(yy);print("\n");
+            break;
+
+    return zbest, gstar, lamb, iterations, bestx, besty
 
-# Step 4: Perform maxt iterations of the subgradient algorithm
-for t in range(maxt):
-    # Step 4.2: Compute lagragian relaxation based on lambda
-    zlambda,sublambda,x,y = ComputeLagrangian(C,F,p,f,lamb)
-    print("# {:5d}: ".format(t))
-    print("UB = {:8.3f} ".format(zlambda))
-
-    # Step 4.3: Modify the lagrangian solution into a feasible solution
-    obj,xx,yy = LagrangianHeuristic(C,F,p,f,x,y)
-    if (obj>gstar):
-        gstar=obj;
-
-    print("/ LB = {:8.3f}".format(gstar))
-    if ((zlambda-gstar)<=1e-4):
-        print("\nCurrent solution is optimal \n");
-        show(xx);print("\n");
-        break;
 
+###########################################################################################################
+if __name__ == '__main__':
+    # Step 1: Initalize algorithms parameters
+    rho = 1; K = 5; age = 10; maxt = 10000; C = 10; F = 10; lamb = np.zeros(C);
 
+    # Step 2: Generate problem instance
+    C, F, p, f = generateFacilityLocationData(C,F)
 
-    # Step 4.4: Perform a subgradient step
-    lamb, rho, g, age, done = SubgradientStep(zlambda, C, lamb, sublambda, rho, K, g, gstar, age)
-    if (done=='y'):
-        print("\nCurrent solution is optimal \n");
-        print(xx);print(yy);print(II),print("\n");
-        break;
+    # Step 3: Perform maxt iterations of the subgradient algorithm
+    SubgradientMethod(C,F,p,f,lamb,maxt,rho,K,age)